@@ -5,6 +5,8 @@ from __future__ import (
     division,
     )
 
+import threading
+
 class LRUNode(object):
     def __init__(self):
         self.next = None
@@ -20,13 +22,20 @@ class LRUCacheDict(object):
 
     def __init__(self, size=512):
         self.data = {}
+        self.size = size
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
         # create circlular double link list
         self.head = LRUNode()
         self.head.next = self.head
         self.head.prev = self.head
 
-        for i in range(size):
+        # head is the first node
+        for i in range(size - 1):
             node = LRUNode()
             node.next = self.head
             node.prev = self.head.prev
@@ -64,6 +73,7 @@ class LRUCacheDict(object):
 
         if not node.empty:
             del self.data[node.key]
+            self.evictions += 1
 
         node.empty = False
         node.key = key
@@ -81,8 +91,10 @@ class LRUCacheDict(object):
     def get(self, key, default=None):
         node = self.data.get(key, sentinel)
         if node is sentinel:
+            self.misses += 1
             return default
 
+        self.hits += 1
         self.make_first(node)
         self.head = node
 
@@ -98,3 +110,44 @@ class LRUCacheDict(object):
 
         self.make_first(node)
         self.head = node.next
+
+    def __len__(self):
+        return len(self.data)
+
+    def stats(self):
+        return {'size': self.size,
+                'count': len(self.data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+class ThreadSafeLRUCacheDict(LRUCacheDict):
+    """
+    LRUCacheDict that serializes access with a lock, so it can be shared
+    between threads.
+    """
+
+    def __init__(self, size=512):
+        super(ThreadSafeLRUCacheDict, self).__init__(size)
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self.lock:
+            return super(ThreadSafeLRUCacheDict, self).__contains__(key)
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            super(ThreadSafeLRUCacheDict, self).__setitem__(key, value)
+
+    def get(self, key, default=None):
+        with self.lock:
+            return super(ThreadSafeLRUCacheDict, self).get(key, default)
+
+    def __delitem__(self, key):
+        with self.lock:
+            super(ThreadSafeLRUCacheDict, self).__delitem__(key)
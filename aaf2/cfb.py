@@ -11,12 +11,15 @@ import sys
 import os
 import io
 import math
+import mmap
 import weakref
 from array import array
 from struct import Struct
 import struct
 from collections import deque
 import random
+import heapq
+import threading
 
 from .utils import (
     read_u8, read_u16le,
@@ -30,7 +33,7 @@ from .utils import (
     unpack_u16le_from, unpack_u32le_from, unpack_u64le_from
 )
 from .exceptions import CompoundFileBinaryError
-from .cache import LRUCacheDict
+from .cache import LRUCacheDict, ThreadSafeLRUCacheDict
 from .import auid
 
 from io import BytesIO
@@ -76,9 +79,34 @@ DIR_STRUCT = Struct(str(''.join(( '<',
     'Q',   # byte_size 120
 ))))
 
+if hasattr(os, 'preadv'):
+    def preadinto(fd, buffer, pos):
+        return os.preadv(fd, [buffer], pos)
+elif hasattr(os, 'pread'):
+    def preadinto(fd, buffer, pos):
+        data = os.pread(fd, len(buffer), pos)
+        buffer[:len(data)] = data
+        return len(data)
+else:
+    preadinto = None
+
 def pretty_sectors(fat):
     return [fat_sector_types.get(item, item) for item in fat]
 
+def iter_extents(fat_chain, start, end):
+    """
+    Yields ``(sid, count)`` runs of physically contiguous sectors
+    for the fat_chain entries between start and end.
+    """
+    index = start
+    while index < end:
+        sid = fat_chain[index]
+        count = 1
+        while index + count < end and fat_chain[index + count] == sid + count:
+            count += 1
+        yield sid, count
+        index += count
+
 class Stream(object):
     __slots__ = ('storage', 'dir', 'mode', 'pos', 'fat_chain')
     def __init__(self, storage, entry, mode='r'):
@@ -143,9 +171,51 @@ class Stream(object):
             bytes_to_read = max(0, min(n, byte_size - self.tell()))
 
         result = bytearray(bytes_to_read)
-        mv = memoryview(result)
+        self.readinto(result)
+        return result
+
+    def readinto(self, buffer):
+        """
+        Read bytes into a pre-allocated, writable bytes-like object buffer,
+        returns the number of bytes read.
+        """
+        mv = memoryview(buffer)
+        if mv.itemsize != 1:
+            mv = mv.cast('B')
+
+        bytes_to_read = max(0, min(len(mv), self.dir.byte_size - self.tell()))
+        mv = mv[:bytes_to_read]
+
+        if self.dir.byte_size < self.storage.min_stream_max_size:
+            self.read_mini_sectors(mv)
+        else:
+            self.read_extents(mv)
+
+        return bytes_to_read
+
+    def iter_chunks(self, size, buffer=None):
+        """
+        Generator that reads the stream from the current position in chunks of
+        up to size bytes. Every chunk is a memoryview into buffer, which is reused
+        for each chunk, copy the chunk if it needs to outlive the iteration.
+        """
+        if buffer is None:
+            buffer = bytearray(size)
+
+        mv = memoryview(buffer)
+        if mv.itemsize != 1:
+            mv = mv.cast('B')
+        mv = mv[:size]
+
+        while True:
+            bytes_read = self.readinto(mv)
+            if not bytes_read:
+                break
+            yield mv[:bytes_read]
+
+    def read_mini_sectors(self, mv):
+        bytes_to_read = len(mv)
 
-        is_mini_stream = byte_size < self.storage.min_stream_max_size
         full_sector_size = self.storage.sector_size
         mini_sector_size = self.storage.mini_stream_sector_size
         mini_stream_chain = self.storage.mini_stream_chain
@@ -153,46 +223,29 @@ class Stream(object):
         sector_data = None
         prev_sid = -1
 
-        if is_mini_stream:
-             mini_fat_index     = self.pos // mini_sector_size
-             mini_sector_offset = self.pos  % mini_sector_size
-             sector_size = mini_sector_size
-        else:
-            index      = self.pos // full_sector_size
-            start_offset = self.pos  % full_sector_size
-            sector_size = full_sector_size
+        mini_fat_index     = self.pos // mini_sector_size
+        mini_sector_offset = self.pos  % mini_sector_size
 
         while bytes_to_read > 0:
 
             # inlined on purpose this loop runs alot
-            if is_mini_stream:
-                mini_stream_sid = self.fat_chain[mini_fat_index]
-                mini_stream_pos = (mini_stream_sid * mini_sector_size) + mini_sector_offset
+            mini_stream_sid = self.fat_chain[mini_fat_index]
+            mini_stream_pos = (mini_stream_sid * mini_sector_size) + mini_sector_offset
 
-                index      = mini_stream_pos // full_sector_size
-                sid_offset = mini_stream_pos  % full_sector_size
+            index      = mini_stream_pos // full_sector_size
+            sid_offset = mini_stream_pos  % full_sector_size
 
-                sid = mini_stream_chain[index]
-                sector_offset = mini_sector_offset
-
-                mini_sector_offset = 0
-                mini_fat_index += 1
-
-                if sid != prev_sid:
-                    sector_data = read_sector_data(sid)
-                    prev_sid = sid
-
-            else:
-                sid = self.fat_chain[index]
-                sector_offset = start_offset
-                sid_offset = start_offset
+            sid = mini_stream_chain[index]
+            sector_offset = mini_sector_offset
 
-                index += 1
-                start_offset = 0
+            mini_sector_offset = 0
+            mini_fat_index += 1
 
+            if sid != prev_sid:
                 sector_data = read_sector_data(sid)
+                prev_sid = sid
 
-            bytes_can_read = min(bytes_to_read, sector_size - sector_offset)
+            bytes_can_read = min(bytes_to_read, mini_sector_size - sector_offset)
             assert bytes_can_read > 0
 
             mv[:bytes_can_read] = sector_data[sid_offset:sid_offset+bytes_can_read]
@@ -202,7 +255,41 @@ class Stream(object):
 
             bytes_to_read -= bytes_can_read
 
-        return result
+    def read_extents(self, mv):
+        """
+        Reads runs of physically contiguous sectors with a single read per run.
+        """
+        bytes_to_read = len(mv)
+        if bytes_to_read == 0:
+            return
+
+        sector_size = self.storage.sector_size
+        read_sector_data = self.storage.read_sector_data
+        read_range = self.storage.read_range
+
+        index, sid_offset = divmod(self.pos, sector_size)
+        end_index = (self.pos + bytes_to_read - 1) // sector_size + 1
+
+        for sid, count in iter_extents(self.fat_chain, index, end_index):
+            bytes_can_read = min(bytes_to_read, (count * sector_size) - sid_offset)
+            assert bytes_can_read > 0
+
+            if count == 1 and bytes_can_read < sector_size:
+                # partial sectors go through the sector cache
+                sector_data = read_sector_data(sid)
+                mv[:bytes_can_read] = sector_data[sid_offset:sid_offset+bytes_can_read]
+            else:
+                # make sure buffered writes are visible
+                if self.storage.dirty_sectors:
+                    self.storage.flush_sectors()
+                pos = ((sid + 1) * sector_size) + sid_offset
+                read_range(pos, mv[:bytes_can_read])
+
+            self.pos += bytes_can_read
+            mv = mv[bytes_can_read:]
+
+            bytes_to_read -= bytes_can_read
+            sid_offset = 0
 
     def allocate(self, byte_size):
 
@@ -249,63 +336,73 @@ class Stream(object):
 
         mv = memoryview(data)
 
-        is_mini_stream = self.dir.byte_size < self.storage.min_stream_max_size
+        if self.dir.byte_size < self.storage.min_stream_max_size:
+            self.write_mini_sectors(mv)
+        else:
+            self.write_extents(mv)
+
+        assert self.pos <= self.dir.byte_size
+
+    def write_mini_sectors(self, mv):
+        data_size = len(mv)
+
         full_sector_size = self.storage.sector_size
         mini_sector_size = self.storage.mini_stream_sector_size
         mini_stream_chain = self.storage.mini_stream_chain
-        sector_cache = self.storage.sector_cache
-        f = self.storage.f
+        write_sector_data = self.storage.write_sector_data
 
-        if is_mini_stream:
-            mini_fat_index     = self.pos // mini_sector_size
-            mini_sector_offset = self.pos  % mini_sector_size
-            sector_size = mini_sector_size
-        else:
-            index      = self.pos // full_sector_size
-            sid_offset = self.pos  % full_sector_size
-            sector_size = full_sector_size
+        mini_fat_index     = self.pos // mini_sector_size
+        mini_sector_offset = self.pos  % mini_sector_size
 
         while data_size > 0:
 
             # inlined on purpose this method can get called alot
-            if is_mini_stream:
-                mini_stream_sid = self.fat_chain[mini_fat_index]
-                mini_stream_pos  = (mini_stream_sid * mini_sector_size) + mini_sector_offset
+            mini_stream_sid = self.fat_chain[mini_fat_index]
+            mini_stream_pos  = (mini_stream_sid * mini_sector_size) + mini_sector_offset
 
-                index      = mini_stream_pos // full_sector_size
-                sid_offset = mini_stream_pos  % full_sector_size
+            index      = mini_stream_pos // full_sector_size
+            sid_offset = mini_stream_pos  % full_sector_size
 
-                sid = mini_stream_chain[index]
+            sid = mini_stream_chain[index]
 
-                sector_offset = mini_sector_offset
-                seek_pos = ((sid + 1) *  full_sector_size) + sid_offset
+            sector_offset = mini_sector_offset
 
-                mini_fat_index += 1
-                mini_sector_offset = 0
+            mini_fat_index += 1
+            mini_sector_offset = 0
 
-            else:
-                sid = self.fat_chain[index]
-                sector_offset = sid_offset
+            byte_writeable = min(len(mv), mini_sector_size - sector_offset)
+            assert byte_writeable > 0
 
-                seek_pos = ((sid + 1) *  full_sector_size) + sid_offset
+            write_sector_data(sid, sid_offset, mv[:byte_writeable])
+            self.pos += byte_writeable
 
-                index += 1
-                sid_offset = 0
+            mv = mv[byte_writeable:]
+            data_size -= byte_writeable
 
-            byte_writeable = min(len(mv), sector_size - sector_offset)
-            assert byte_writeable > 0
+    def write_extents(self, mv):
+        """
+        Writes runs of physically contiguous sectors with a single write per run.
+        """
+        data_size = len(mv)
+        if data_size == 0:
+            return
+
+        sector_size = self.storage.sector_size
+        write_extent = self.storage.write_extent
 
-            if sid in sector_cache:
-                del sector_cache[sid]
+        index, sid_offset = divmod(self.pos, sector_size)
+        end_index = (self.pos + data_size - 1) // sector_size + 1
+
+        for sid, count in iter_extents(self.fat_chain, index, end_index):
+            byte_writeable = min(data_size, (count * sector_size) - sid_offset)
+            assert byte_writeable > 0
 
-            f.seek(seek_pos)
-            f.write(mv[:byte_writeable])
+            write_extent(sid, sid_offset, mv[:byte_writeable])
             self.pos += byte_writeable
 
             mv = mv[byte_writeable:]
             data_size -= byte_writeable
-
-        assert self.pos <= self.dir.byte_size
+            sid_offset = 0
 
     def truncate(self, size=None):
         # print("trunc", self.dir.path())
@@ -635,7 +732,7 @@ class DirEntry(object):
 
     @modify_time.setter
     def modify_time(self, value):
-        struct.pack_into(str('<Q'), bytes(self.data), 108, value)
+        struct.pack_into(str('<Q'), self.data, 108, value)
         self.mark_modified()
 
     @property
@@ -1052,18 +1149,149 @@ class DirEntry(object):
         return self.storage.create_dir_entry(path, 'stream', None)
 
     def write(self):
-        f = self.storage.f
-        f.seek(self.storage.dir_entry_pos(self.dir_id))
-        f.write(self.data)
+        sid, sid_offset = self.storage.dir_entry_sid_offset(self.dir_id)
+        self.storage.write_sector_data(sid, sid_offset, self.data)
 
     def read(self):
-        f = self.storage.f
-        f.seek(self.storage.dir_entry_pos(self.dir_id))
-        f.readinto(self.data)
+        sid, sid_offset = self.storage.dir_entry_sid_offset(self.dir_id)
+        sector_data = self.storage.read_sector_data(sid)
+        self.data[:] = sector_data[sid_offset:sid_offset+128]
 
     def __repr__(self):
         return self.name
 
+class TableDirEntry(DirEntry):
+    """
+    Read only DirEntry whose name and tree fields come from the DirTable.
+    The raw entry is only read for the fields the table doesn't keep.
+    """
+    __slots__ = ()
+
+    def __init__(self, storage, dir_id):
+        self.storage = storage
+        self.dir_id = dir_id
+        self.parent = None
+        self._name = storage.dir_table.names[dir_id]
+
+    def __getattr__(self, name):
+        # only called while the data slot is unset
+        if name != 'data':
+            raise AttributeError(name)
+        sid, sid_offset = self.storage.dir_entry_sid_offset(self.dir_id)
+        self.data = bytearray(self.storage.read_sector_data(sid)[sid_offset:sid_offset+128])
+        return self.data
+
+    @property
+    def type(self):
+        return dir_types.get(self.storage.dir_table.types[self.dir_id], "unknown")
+
+    @property
+    def left_id(self):
+        return decode_sid(self.storage.dir_table.left_ids[self.dir_id])
+
+    @property
+    def right_id(self):
+        return decode_sid(self.storage.dir_table.right_ids[self.dir_id])
+
+    @property
+    def child_id(self):
+        return decode_sid(self.storage.dir_table.child_ids[self.dir_id])
+
+    @property
+    def sector_id(self):
+        return decode_sid(self.storage.dir_table.sector_ids[self.dir_id])
+
+    @property
+    def byte_size(self):
+        return self.storage.dir_table.byte_sizes[self.dir_id]
+
+class DirTable(object):
+    """
+    The whole directory stream parsed in one pass into parallel arrays
+    indexed by dir_id, served through TableDirEntry. Only used for read only
+    files, it is never updated.
+    """
+
+    def __init__(self, storage, children_cache):
+        chain = storage.dir_fat_chain
+        sector_size = storage.sector_size
+
+        data = bytearray(len(chain) * sector_size)
+        mv = memoryview(data)
+        index = 0
+        for sid, count in iter_extents(chain, 0, len(chain)):
+            size = count * sector_size
+            storage.read_range((sid + 1) * sector_size, mv[index:index+size])
+            index += size
+        del mv
+
+        self.names = []
+        self.types = bytearray()
+        self.left_ids = array(str('I'))
+        self.right_ids = array(str('I'))
+        self.child_ids = array(str('I'))
+        self.sector_ids = array(str('I'))
+        try:
+            self.byte_sizes = array(str('Q'))
+        except ValueError:
+            # python 2 has no 64 bit array type
+            self.byte_sizes = []
+
+        # dir_id -> {name: dir_id}
+        self.children_ids = children_cache
+
+        unpack_from = DIR_STRUCT.unpack_from
+        for pos in range(0, len(data), 128):
+            (name_data, name_size, dir_type, color,
+             left_id, right_id, child_id, class_id, flags,
+             create_time, modify_time, sector_id, byte_size) = unpack_from(data, pos)
+
+            if dir_type:
+                self.names.append(decode_utf16le(name_data[:min(name_size, 64)]))
+            else:
+                self.names.append('')
+            self.types.append(dir_type)
+            self.left_ids.append(left_id)
+            self.right_ids.append(right_id)
+            self.child_ids.append(child_id)
+            self.sector_ids.append(sector_id)
+            self.byte_sizes.append(byte_size)
+
+    def __len__(self):
+        return len(self.names)
+
+    def children(self, dir_id):
+        """
+        Returns a dict of name to dir_id of the children of dir_id.
+        """
+        result = self.children_ids.get(dir_id, None)
+        if result is not None:
+            return result
+
+        names = self.names
+        left_ids = self.left_ids
+        right_ids = self.right_ids
+        entry_count = len(names)
+
+        result = {}
+        stack = [self.child_ids[dir_id]]
+        count = 0
+        while stack:
+            current = stack.pop()
+            if current == FREESECT:
+                continue
+
+            count += 1
+            if current >= entry_count or count > entry_count:
+                raise CompoundFileBinaryError("corrupt folder structure")
+
+            result[names[current]] = current
+            stack.append(left_ids[current])
+            stack.append(right_ids[current])
+
+        self.children_ids[dir_id] = result
+        return result
+
 def extend_sid_table(f, table, byte_size):
     n = byte_size // 4
     if isinstance(f, io.RawIOBase):
@@ -1075,9 +1303,31 @@ def extend_sid_table(f, table, byte_size):
         table.fromstring(f.read(byte_size))
 
 class CompoundFileBinary(object):
-    def __init__(self, file_object, mode='rb', sector_size=4096):
+    def __init__(self, file_object, mode='rb', sector_size=4096, mmap=False, threadsafe=False,
+                 write_buffer_size=4*1024*1024, sector_cache_size=512, children_cache_size=512,
+                 dir_table=False):
 
         self.f = file_object
+        self.mmap = None
+        self.mmap_view = None
+        self.mmap_size = 0
+
+        # used for positional reads when threadsafe
+        self.fd = None
+        self.io_lock = None
+
+        if isinstance(self.f, BytesIO):
+            self.mode = 'wb+'
+        else:
+            self.mode = mode
+
+        if threadsafe and self.mode not in ("r", "rb"):
+            raise ValueError("threadsafe only supported in read only mode")
+        self.threadsafe = threadsafe
+
+        if dir_table and self.mode not in ("r", "rb"):
+            raise ValueError("dir_table only supported in read only mode")
+        self.dir_table = None
 
         self.difat = [[]]
         self.fat = array(str('I'))
@@ -1094,18 +1344,33 @@ class CompoundFileBinary(object):
 
         self.modified = {}
 
-        self.sector_cache = LRUCacheDict()
+        # fat, minifat and difat sector sid -> table values last written to it,
+        # so flush only rewrites the table sectors that changed
+        self.table_sectors = {}
+        # free dir_ids not yet cleared on disk
+        self.dir_freelist_dirty = set()
+
+        cache_class = ThreadSafeLRUCacheDict if threadsafe else LRUCacheDict
+        self.sector_cache = cache_class(sector_cache_size)
+        # write back buffer, sid -> full sector bytearray
+        self.dirty_sectors = {}
+        self.write_buffer_size = write_buffer_size
         self.dir_cache = weakref.WeakValueDictionary()
-        self.children_cache = LRUCacheDict()
+        # full path -> dir_id, entries released from dir_cache are read again by id
+        self.path_index = {}
+        self.children_cache = cache_class(children_cache_size)
         self.dir_freelist = []
 
         self.debug_grow = False
         self.is_open = True
 
-        if isinstance(self.f, BytesIO):
-            self.mode = 'wb+'
-        else:
-            self.mode = mode
+        # total bytes read from file_object, not locked in threadsafe mode
+        self.bytes_read = 0
+
+        if mmap:
+            self.setup_mmap()
+        elif threadsafe:
+            self.setup_threadsafe()
 
         if self.mode in ("r", "r+", "rb", 'rb+'):
 
@@ -1120,6 +1385,8 @@ class CompoundFileBinary(object):
                 self.dir_sector_count = len(self.dir_fat_chain)
 
             logging.debug("read %d dir sectors" % len(self.dir_fat_chain))
+            if dir_table:
+                self.dir_table = DirTable(self, cache_class(children_cache_size))
             self.root = self.read_dir_entry(0)
             self.dir_cache[0] = self.root
 
@@ -1138,37 +1405,101 @@ class CompoundFileBinary(object):
 
             logging.debug("writing root dir sector")
             self.root.write()
-            self.f.write(bytearray(self.sector_size - 128))
             self.write_fat()
 
-    def close(self):
-        if self.mode in ("r", "rb"):
+    def stats(self):
+        """
+        Returns cache counters and total bytes read.
+        """
+        return {'sector_cache': self.sector_cache.stats(),
+                'children_cache': self.children_cache.stats(),
+                'bytes_read': self.bytes_read}
+
+    def setup_mmap(self):
+        if self.mode not in ("r", "rb"):
+            raise ValueError("mmap only supported in read only mode")
+
+        self.mmap = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        if sys.version_info.major >= 3:
+            self.mmap_view = memoryview(self.mmap)
+        else:
+            # python 2 mmap has no buffer interface, slices are copies
+            self.mmap_view = self.mmap
+        self.mmap_size = len(self.mmap)
+
+    def setup_threadsafe(self):
+        # use positional reads if possible, they don't share the file position
+        try:
+            fd = self.f.fileno()
+        except (AttributeError, IOError, ValueError):
+            fd = None
+
+        if fd is not None and preadinto is not None:
+            self.fd = fd
+        else:
+            self.io_lock = threading.Lock()
+
+    def close_mmap(self):
+        if self.mmap is None:
             return
 
-        # calculate mini stream size
-        if self.root.sector_id is not None:
-            # I cannot find this documented anywhere but the size of the mini stream
-            # is the size up to the last mini sector is uses. Not the total Non FREESECT's.
-            # If self.root.byte_size is not set correctly the some applications will crash hard...
+        if self.mmap_view is not self.mmap:
+            self.mmap_view.release()
+        self.mmap_view = None
+        try:
+            self.mmap.close()
+        except BufferError:
+            # sector views still referenced, mmap closes when they are released
+            pass
+        self.mmap = None
+
+    def mini_stream_byte_size(self):
+        # I cannot find this documented anywhere but the size of the mini stream
+        # is the size up to the last mini sector is uses. Not the total Non FREESECT's.
+        # If self.root.byte_size is not set correctly the some applications will crash hard...
+
+        # find last non-free sect
+        for i,v in enumerate(reversed(self.minifat)):
+            if v != FREESECT:
+                break
 
-            # find last non-free sect
-            for i,v in enumerate(reversed(self.minifat)):
-                if v != FREESECT:
-                    break
+        last_used_sector_id = len(self.minifat) - i
+        return last_used_sector_id * self.mini_stream_sector_size
 
-            last_used_sector_id = len(self.minifat) - i
-            mini_stream_byte_size = (last_used_sector_id * self.mini_stream_sector_size)
-            self.root.byte_size = mini_stream_byte_size
+    def flush(self):
+        """
+        Writes the header, fat tables, directory and any buffered sectors,
+        leaving the file consistent on disk. Does nothing in read only mode.
+        """
+        if self.mode in ("r", "rb"):
+            return
 
-            # Truncate ministream
-            s = Stream(self, self.root, 'rw')
-            s.truncate(mini_stream_byte_size)
+        if self.root.sector_id is not None:
+            self.root.byte_size = self.mini_stream_byte_size()
 
         self.write_header()
         self.write_difat()
         self.write_fat()
         self.write_minifat()
         self.write_dir_entries()
+        self.flush_sectors()
+        self.f.flush()
+
+    def close(self):
+        if self.mode in ("r", "rb"):
+            self.close_mmap()
+            self.is_open = False
+            return
+
+        # Truncate ministream, the mini_stream_chain is stale afterwards so
+        # this is only done on close
+        if self.root.sector_id is not None:
+            mini_stream_byte_size = self.mini_stream_byte_size()
+            self.root.byte_size = mini_stream_byte_size
+            s = Stream(self, self.root, 'rw')
+            s.truncate(mini_stream_byte_size)
+
+        self.flush()
 
         # Truncate file to the last free sector
         for i,v in enumerate(reversed(self.fat)):
@@ -1266,8 +1597,8 @@ class CompoundFileBinary(object):
         for i in range(109):
             write_u32le(f, self.difat[0][i])
 
-        for i in range(self.sector_size - f.tell()):
-            f.write(b'\0')
+        # pad the rest of the header sector
+        f.write(bytearray(self.sector_size - f.tell()))
 
 
     def read_header(self):
@@ -1366,6 +1697,8 @@ class CompoundFileBinary(object):
                 item = read_u32le(f)
                 difat.append(item)
             self.difat.append(difat)
+            if self.mode not in ("r", "rb"):
+                self.table_sectors[sid] = list(difat)
 
             sid = difat[-1]
             logging.debug("next difat: %d" % sid)
@@ -1391,12 +1724,13 @@ class CompoundFileBinary(object):
         for i in range(109):
             write_u32le(f, self.difat[0][i])
 
-        for i in range(self.sector_size - f.tell()):
-            f.write(b'\0')
+        # pad the rest of the header sector
+        f.write(bytearray(self.sector_size - f.tell()))
 
         if self.difat_sector_count == 0:
             return
 
+        difat_table_struct = Struct(str('<%dI' % (self.sector_size // 4)))
         sid = self.difat_sector_start
         assert len(self.difat[1:]) == self.difat_sector_count
         for table in self.difat[1:]:
@@ -1405,11 +1739,8 @@ class CompoundFileBinary(object):
             if not isinstance(sector_type, int):
                 raise IOError("bad difat sector type")
 
-            pos = (sid + 1) * self.sector_size
-            logging.debug("writing difat to sid: %d at: %d" % (sid,pos))
-            f.seek(pos)
-            for i in range(self.sector_size // 4):
-                write_u32le(f, table[i])
+            logging.debug("writing difat to sid: %d" % sid)
+            self.write_table_sector(sid, list(table), difat_table_struct)
 
             sid = table[-1]
 
@@ -1441,9 +1772,13 @@ class CompoundFileBinary(object):
         if sys.byteorder == 'big':
             self.fat.byteswap()
 
-        for i,v in enumerate(self.fat):
-            if v == FREESECT:
-                self.fat_freelist.append(i)
+        # freelist is only needed for writing, ascending order is already a valid heap
+        if self.mode not in ("r", "rb"):
+            self.fat_freelist = [i for i, v in enumerate(self.fat) if v == FREESECT]
+
+            element_count = self.sector_size // 4
+            for i, sid in enumerate(fat_sectors):
+                self.table_sectors[sid] = self.fat[i * element_count:(i + 1) * element_count]
 
         logging.debug("read %d fat sectors ", sector_count)
 
@@ -1455,7 +1790,6 @@ class CompoundFileBinary(object):
 
     def write_fat(self):
         logging.debug("writing fat")
-        f = self.f
         sector_count = 0
 
         assert len(self.fat)*4 % self.sector_size == 0
@@ -1476,10 +1810,9 @@ class CompoundFileBinary(object):
         for i, sid in enumerate(fat_sectors):
 
             # logging.debug("writing fat to sid: %d" % sid)
-            f.seek((sid + 1) *  self.sector_size)
             start = i * element_count
             end = start + element_count
-            f.write(fat_table_struct.pack(*self.fat[start:end]))
+            self.write_table_sector(sid, self.fat[start:end], fat_table_struct)
 
     def read_minifat(self):
         f = self.f
@@ -1495,14 +1828,18 @@ class CompoundFileBinary(object):
         if sys.byteorder == 'big':
              self.minifat.byteswap()
 
-        # mini_stream_byte_size = 0
+        if self.mode not in ("r", "rb"):
+            element_count = self.sector_size // 4
+            for i, sid in enumerate(self.minifat_chain):
+                self.table_sectors[sid] = self.minifat[i * element_count:(i + 1) * element_count]
+
+        self.minifat_freelist = [i for i, v in enumerate(self.minifat) if v == FREESECT]
+
         last_used_sector = 0
-        for i,v in enumerate(self.minifat):
-            if v == FREESECT:
-                self.minifat_freelist.append(i)
-            else:
+        for i in range(len(self.minifat) - 1, -1, -1):
+            if self.minifat[i] != FREESECT:
                 last_used_sector = i
-                # mini_stream_byte_size += self.mini_stream_sector_size
+                break
 
         mini_stream_byte_size = ((last_used_sector+1) * self.mini_stream_sector_size)
 
@@ -1513,72 +1850,78 @@ class CompoundFileBinary(object):
         return mini_stream_byte_size
 
     def write_minifat(self):
-        f = self.f
         sector_count = 0
 
         element_count = self.sector_size // 4
         fat_table_struct = Struct(str('<%dI' % element_count))
 
         for i, sid in enumerate(self.get_fat_chain(self.minifat_sector_start)):
-            pos = (sid + 1) *  self.sector_size
-            f.seek(pos)
             start = i * element_count
             end = start + element_count
-            f.write(fat_table_struct.pack(*self.minifat[start:end]))
+            self.write_table_sector(sid, self.minifat[start:end], fat_table_struct)
+
+    def write_table_sector(self, sid, values, table_struct):
+        """
+        Writes a fat, minifat or difat sector unless it already holds values.
+        """
+        if self.table_sectors.get(sid, None) == values:
+            return
+        self.write_sector_data(sid, 0, table_struct.pack(*values))
+        self.table_sectors[sid] = values
 
     def write_modified_dir_entries(self):
 
-        f = self.f
         for dir_id in sorted(self.modified):
             entry = self.modified[dir_id]
-            stream_pos = entry.dir_id * 128
-            chain_index = stream_pos // self.sector_size
-            sid_offset  = stream_pos % self.sector_size
-            sid = self.dir_fat_chain[chain_index]
-
-            pos = ((sid + 1) *  self.sector_size) + sid_offset
+            sid, sid_offset = self.dir_entry_sid_offset(entry.dir_id)
 
-            f.seek(pos)
             # force black everything
             # entry.data[67] = 0x01
-            f.write(entry.data)
-
-            # invalidate  sector
-            if sid in self.sector_cache:
-                del self.sector_cache[sid]
+            self.write_sector_data(sid, sid_offset, entry.data)
 
         self.modified = {}
 
     def write_dir_entries(self):
         self.write_modified_dir_entries()
 
-        # clear empty DirEntrys
+        # clear DirEntrys freed since the last flush
         empty_dir = bytearray(128)
-        f = self.f
 
-        self.dir_freelist.sort()
-        for dir_id in self.dir_freelist:
+        for dir_id in sorted(self.dir_freelist_dirty):
+            sid, sid_offset = self.dir_entry_sid_offset(dir_id)
+            self.write_sector_data(sid, sid_offset, empty_dir)
+        self.dir_freelist_dirty = set()
 
-            stream_pos = dir_id * 128
-            chain_index = stream_pos // self.sector_size
-            sid_offset  = stream_pos % self.sector_size
-            sid = self.dir_fat_chain[chain_index]
+    def pop_freelist(self, freelist, fat, prefer=None):
+        """
+        Returns the next free sid from freelist, a heap of sids.
+        If prefer is free it is used instead so growing chains stay contiguous.
+        Entries that are no longer free are discarded lazily. Returns None if
+        there are no free sids.
+        """
+        if prefer is not None and prefer < len(fat) and fat[prefer] == FREESECT:
+            return prefer
 
-            pos = ((sid + 1) *  self.sector_size) + sid_offset
+        while freelist:
+            i = heapq.heappop(freelist)
+            # drop duplicates of the same sid
+            while freelist and freelist[0] == i:
+                heapq.heappop(freelist)
+            if fat[i] == FREESECT:
+                return i
 
-            f.seek(pos)
-            f.write(empty_dir)
+        return None
 
-    def next_free_minifat_sect(self):
+    def next_free_minifat_sect(self, prefer=None):
 
         idx_per_sect = self.sector_size // self.mini_stream_sector_size
         stream_sects = len(self.mini_stream_chain) * idx_per_sect
 
-        if self.minifat_freelist:
-            i = self.minifat_freelist.pop(0)
-            assert self.minifat[i] == FREESECT
-            if i+1 > stream_sects:
+        i = self.pop_freelist(self.minifat_freelist, self.minifat, prefer)
+        if i is not None:
+            while i+1 > stream_sects:
                 self.mini_stream_grow()
+                stream_sects += idx_per_sect
             return i
 
         # if we got here need to add additional fat
@@ -1589,7 +1932,8 @@ class CompoundFileBinary(object):
         idx_end = idx_start + self.sector_size // 4
 
         self.minifat.extend([FREESECT for i in range(idx_start, idx_end)])
-        self.minifat_freelist.extend([i for i in range(idx_start, idx_end)])
+        for i in range(idx_start, idx_end):
+            heapq.heappush(self.minifat_freelist, i)
 
         if self.minifat_sector_count == 0:
             self.minifat_sector_count = 1
@@ -1601,15 +1945,12 @@ class CompoundFileBinary(object):
         self.minifat_chain.append(sid)
         self.fat[sid] = ENDOFCHAIN
 
-        return self.next_free_minifat_sect()
+        return self.next_free_minifat_sect(prefer)
 
-    def next_free_sect(self):
-
-        if self.fat_freelist:
-            # print("using fat free list")
-            i = self.fat_freelist.pop(0)
-            assert self.fat[i] == FREESECT
+    def next_free_sect(self, prefer=None):
 
+        i = self.pop_freelist(self.fat_freelist, self.fat, prefer)
+        if i is not None:
             # Handle Range Lock Sector
             if i == RANGELOCKSECT and self.sector_size == 4096:
                 self.fat[i] = ENDOFCHAIN
@@ -1675,9 +2016,9 @@ class CompoundFileBinary(object):
             logging.debug("adding range lock")
             self.fat[RANGELOCKSECT] = ENDOFCHAIN
 
-        freelist = [i for i in range(idx_start, idx_end) if i not in non_free_sids]
-
-        self.fat_freelist.extend(freelist)
+        for i in range(idx_start, idx_end):
+            if i not in non_free_sids:
+                heapq.heappush(self.fat_freelist, i)
 
         self.fat[new_fat_sect] = FATSECT
         self.fat_sector_count += 1
@@ -1685,23 +2026,161 @@ class CompoundFileBinary(object):
         if not new_difat_sect is None:
             self.fat[new_difat_sect] = DIFSECT
 
-        return self.next_free_sect()
+        return self.next_free_sect(prefer)
 
     def read_sector_data(self, sid):
 
+        if self.mmap_view is not None:
+            # zero-copy, slice directly out of the mapped file
+            pos = (sid + 1) *  self.sector_size
+            end = pos + self.sector_size
+            if end <= self.mmap_size:
+                self.bytes_read += self.sector_size
+                return self.mmap_view[pos:end]
+
+            # truncated sector, pad with zeros
+            sector_data = bytearray(self.sector_size)
+            bytes_left = max(0, self.mmap_size - pos)
+            sector_data[:bytes_left] = self.mmap_view[pos:pos+bytes_left]
+            self.bytes_read += bytes_left
+            return sector_data
+
+        sector_data = self.dirty_sectors.get(sid, None)
+        if sector_data is not None:
+            return sector_data
+
         sector_data = self.sector_cache.get(sid, None)
         if sector_data is not None:
             return sector_data
         else:
             pos = (sid + 1) *  self.sector_size
-            self.f.seek(pos)
             sector_data = bytearray(self.sector_size)
             #NOTE: if requested sector doesn't exist or
             # is truncated will pad with zeros, expected behaviour
-            bytes_read = self.f.readinto(sector_data)
+            self.read_range(pos, sector_data)
             self.sector_cache[sid] = sector_data
             return sector_data
 
+    def read_range(self, pos, buffer):
+        """
+        Reads len(buffer) bytes starting at file position pos into buffer.
+        Anything past the end of the file is padded with zeros.
+        """
+        buffer = memoryview(buffer)
+        byte_size = len(buffer)
+
+        if self.mmap_view is not None:
+            end = max(pos, min(pos + byte_size, self.mmap_size))
+            bytes_read = end - pos
+            buffer[:bytes_read] = self.mmap_view[pos:end]
+        elif self.fd is not None:
+            bytes_read = 0
+            while bytes_read < byte_size:
+                result = preadinto(self.fd, buffer[bytes_read:], pos + bytes_read)
+                if not result:
+                    break
+                bytes_read += result
+        elif self.io_lock is not None:
+            with self.io_lock:
+                bytes_read = self.readinto_at(pos, buffer)
+        else:
+            bytes_read = self.readinto_at(pos, buffer)
+
+        self.bytes_read += bytes_read
+
+        if bytes_read < byte_size:
+            buffer[bytes_read:] = bytearray(byte_size - bytes_read)
+
+        return bytes_read
+
+    def write_sector_data(self, sid, sid_offset, data):
+        """
+        Writes data into sector sid at sid_offset through the write back buffer.
+        """
+        sector_data = self.dirty_sectors.get(sid, None)
+        if sector_data is None:
+            if sid_offset == 0 and len(data) == self.sector_size:
+                sector_data = bytearray(self.sector_size)
+            else:
+                sector_data = self.read_sector_data(sid)
+
+            if sid in self.sector_cache:
+                del self.sector_cache[sid]
+            self.dirty_sectors[sid] = sector_data
+
+        sector_data[sid_offset:sid_offset+len(data)] = data
+
+        if len(self.dirty_sectors) * self.sector_size > self.write_buffer_size:
+            self.flush_sectors()
+
+    def write_extent(self, sid, sid_offset, data):
+        """
+        Writes data to physically contiguous sectors starting at sid.
+        Whole sectors are written directly, partial sectors go through
+        the write back buffer.
+        """
+        sector_size = self.sector_size
+        mv = memoryview(data)
+
+        if sid_offset:
+            n = min(len(mv), sector_size - sid_offset)
+            self.write_sector_data(sid, sid_offset, mv[:n])
+            mv = mv[n:]
+            sid += 1
+
+        count = len(mv) // sector_size
+        if count:
+            for i in range(sid, sid + count):
+                if i in self.dirty_sectors:
+                    del self.dirty_sectors[i]
+                if i in self.sector_cache:
+                    del self.sector_cache[i]
+
+            n = count * sector_size
+            self.f.seek((sid + 1) * sector_size)
+            self.f.write(mv[:n])
+            mv = mv[n:]
+            sid += count
+
+        if len(mv):
+            self.write_sector_data(sid, 0, mv)
+
+    def flush_sectors(self):
+        """
+        Writes out the write back buffer in sorted order,
+        coalescing adjacent dirty sectors into a single write.
+        """
+        dirty_sectors = self.dirty_sectors
+        if not dirty_sectors:
+            return
+
+        self.dirty_sectors = {}
+        f = self.f
+        sids = sorted(dirty_sectors)
+
+        for sid, count in iter_extents(sids, 0, len(sids)):
+            f.seek((sid + 1) * self.sector_size)
+            if count == 1:
+                f.write(dirty_sectors[sid])
+            else:
+                f.write(bytearray().join([dirty_sectors[i] for i in range(sid, sid + count)]))
+
+        # keep the sectors around for reading
+        for sid in sids:
+            self.sector_cache[sid] = dirty_sectors[sid]
+
+    def readinto_at(self, pos, buffer):
+        f = self.f
+        f.seek(pos)
+        bytes_read = 0
+        byte_size = len(buffer)
+        while bytes_read < byte_size:
+            result = f.readinto(buffer[bytes_read:])
+            if not result:
+                break
+            bytes_read += result
+        return bytes_read
+
     def get_sid_offset(self, abs_pos):
         sid, sid_offset = divmod(abs_pos, self.sector_size)
         return sid-1, sid_offset
@@ -1729,6 +2208,12 @@ class CompoundFileBinary(object):
 
         # assert not dir_id in self.dir_freelist
 
+        if self.dir_table is not None:
+            entry = TableDirEntry(self, dir_id)
+            entry.parent = parent
+            self.dir_cache[dir_id] = entry
+            return entry
+
         stream_pos = dir_id * 128
         chain_index = stream_pos // self.sector_size
         sid_offset  = stream_pos % self.sector_size
@@ -1744,18 +2229,15 @@ class CompoundFileBinary(object):
         return entry
 
     def clear_sector(self, sid):
-        sector_pos = (sid + 1) * self.sector_size
-        self.f.seek(sector_pos)
-        # for i in range(self.sector_size):
-        self.f.write(bytearray(self.sector_size))
+        self.write_sector_data(sid, 0, bytearray(self.sector_size))
 
     def next_free_dir_id(self):
 
         # use free list first
         if self.dir_freelist:
-            return self.dir_freelist.pop(0)
-
-        f = self.f
+            dir_id = heapq.heappop(self.dir_freelist)
+            self.dir_freelist_dirty.discard(dir_id)
+            return dir_id
 
         sect = self.fat_chain_append(self.dir_fat_chain[-1])
 
@@ -1764,7 +2246,9 @@ class CompoundFileBinary(object):
 
         first_dir_id = (len(self.dir_fat_chain) - 1) * self.sector_size // 128
         last_dir_id = first_dir_id + (self.sector_size // 128)
-        self.dir_freelist.extend(range(first_dir_id, last_dir_id))
+        for dir_id in range(first_dir_id, last_dir_id):
+            heapq.heappush(self.dir_freelist, dir_id)
+            self.dir_freelist_dirty.add(dir_id)
 
         return self.next_free_dir_id()
 
@@ -1796,7 +2280,8 @@ class CompoundFileBinary(object):
         return sectors
 
     def mini_stream_grow(self):
-        sid = self.next_free_sect()
+        prefer = self.mini_stream_chain[-1] + 1 if self.mini_stream_chain else None
+        sid = self.next_free_sect(prefer)
         # logging.debug("adding to mini stream fat sid: %d" %  sid)
         if not self.mini_stream_chain:
             self.mini_stream_chain = [sid]
@@ -1809,22 +2294,30 @@ class CompoundFileBinary(object):
 
     def fat_chain_append(self, start_sid, minifat=False):
 
+        fat = self.minifat if minifat else self.fat
+
+        # find the last sector, callers usually pass it in directly
+        last_sid = None
+        if start_sid is not None:
+            last_sid = start_sid
+            if fat[last_sid] != ENDOFCHAIN:
+                fat_chain = self.get_fat_chain(start_sid, minifat)
+                assert fat_chain
+                last_sid = fat_chain[-1]
+
+        # prefer the sector directly after the chain to keep it contiguous
+        prefer = None if last_sid is None else last_sid + 1
+
         if minifat:
-            sect = self.next_free_minifat_sect()
+            sect = self.next_free_minifat_sect(prefer)
             # logging.debug("creating new mini sector: %d" % sect)
-            fat = self.minifat
         else:
-            sect = self.next_free_sect()
+            sect = self.next_free_sect(prefer)
             # logging.debug("creating new sector: %d" % sect)
-            fat = self.fat
 
-        if start_sid is None:
-            fat[sect] = ENDOFCHAIN
-        else:
-            fat_chain = self.get_fat_chain(start_sid, minifat)
-            assert fat_chain
-            fat[fat_chain[-1]] = sect
-            fat[sect] = ENDOFCHAIN
+        if last_sid is not None:
+            fat[last_sid] = sect
+        fat[sect] = ENDOFCHAIN
 
         return sect
 
@@ -1836,10 +2329,11 @@ class CompoundFileBinary(object):
         for sid in self.get_fat_chain(start_sid, minifat):
             fat[sid] = FREESECT
             if minifat:
-                self.minifat_freelist.insert(0, sid)
+                heapq.heappush(self.minifat_freelist, sid)
             else:
-                self.fat_freelist.insert(0, sid)
-
+                heapq.heappush(self.fat_freelist, sid)
+                # sector may be reused for data
+                self.table_sectors.pop(sid, None)
 
     def create_dir_entry(self, path, dir_type='storage', class_id=None):
 
@@ -1873,7 +2367,8 @@ class CompoundFileBinary(object):
     def free_dir_entry(self, entry):
 
         # add freelist
-        self.dir_freelist.append(entry.dir_id)
+        heapq.heappush(self.dir_freelist, entry.dir_id)
+        self.dir_freelist_dirty.add(entry.dir_id)
 
         # remove from dir caches
         if entry.dir_id in self.dir_cache:
@@ -1905,6 +2400,7 @@ class CompoundFileBinary(object):
         if entry.type == "storage" and not entry.child_id is None:
             raise ValueError("storage contains children")
 
+        self.path_index.pop(entry.path(), None)
         entry.pop()
 
         # remove stream data
@@ -1929,6 +2425,8 @@ class CompoundFileBinary(object):
 
             root.child_id = None
 
+        self.path_index.clear()
+
         # remove root item
         self.remove(path)
 
@@ -1962,6 +2460,13 @@ class CompoundFileBinary(object):
         if children is not None:
             return children
 
+        if self.dir_table is not None:
+            result = {}
+            for name, dir_id in self.dir_table.children(root.dir_id).items():
+                result[name] = self.read_dir_entry(dir_id, root)
+            self.children_cache[root.dir_id] = result
+            return result
+
         child = root.child()
 
         result = {}
@@ -2005,15 +2510,34 @@ class CompoundFileBinary(object):
         if path == "/":
             return self.root
 
+        dir_id = self.path_index.get(path, None)
+        if dir_id is not None:
+            entry = self.dir_cache.get(dir_id, None)
+            if entry is None:
+                parent = self.find(path.rsplit('/', 1)[0] or '/')
+                entry = self.read_dir_entry(dir_id, parent)
+            return entry
+
         split_path = path.lstrip('/').split("/")
+        entry = self.find_split_path(split_path)
+
+        # only index normalized paths so removing by entry.path() invalidates them
+        if entry is not None and path == '/' + '/'.join(split_path):
+            self.path_index[path] = entry.dir_id
 
+        return entry
+
+    def find_split_path(self, split_path):
         i = 0
         root = self.root
 
         while True:
 
-            children = self.listdir_dict(root)
-            match = children.get(split_path[i], None)
+            if self.dir_table is not None:
+                match = self.find_dir_table(root, split_path[i])
+            else:
+                children = self.listdir_dict(root)
+                match = children.get(split_path[i], None)
 
             if match:
                 if i == len(split_path) - 1:
@@ -2023,6 +2547,20 @@ class CompoundFileBinary(object):
             else:
                 return None
 
+    def find_dir_table(self, root, name):
+        # only creates the DirEntry that matches instead of all its siblings
+        children = self.children_cache.get(root.dir_id, None)
+        if children is not None:
+            return children.get(name, None)
+
+        if not root.isdir():
+            raise ValueError("can only list storage types")
+
+        dir_id = self.dir_table.children(root.dir_id).get(name, None)
+        if dir_id is None:
+            return None
+        return self.read_dir_entry(dir_id, root)
+
     def walk(self, path = None, topdown=True):
         """
         Similar to :func:`os.walk`, yeields a 3-tuple ``(root, storage_items, stream_items)``
@@ -2073,6 +2611,57 @@ class CompoundFileBinary(object):
             for root_item, storage, stream in topdown_visit_node(root):
                 yield root_item, storage, stream
 
+    def compact(self, dst):
+        """
+        Writes a defragmented copy to file object dst, opened for writing.
+        Every stream is written contiguously, small streams are packed
+        together in the mini stream and the directory is rebuilt.
+        Anything under /tmp is skipped.
+        """
+        cfb = CompoundFileBinary(dst, 'wb+', sector_size=self.sector_size)
+        cfb.class_id = self.class_id
+        cfb.root.class_id = self.root.class_id
+
+        def copy_entry_info(src, dst):
+            dst.flags = src.flags
+            dst.create_time = src.create_time
+            dst.modify_time = src.modify_time
+
+        copy_entry_info(self.root, cfb.root)
+
+        # create the whole directory first so its sectors don't end up between stream data
+        mini_streams = []
+        large_streams = []
+        for root, storage_items, stream_items in self.walk():
+            if root.isroot():
+                # prune /tmp from the walk
+                storage_items[:] = [item for item in storage_items if item.name != 'tmp']
+
+            for item in storage_items:
+                entry = cfb.makedir(item.path(), class_id=item.class_id)
+                copy_entry_info(item, entry)
+
+            for item in stream_items:
+                entry = cfb.create_dir_entry(item.path(), 'stream', item.class_id)
+                copy_entry_info(item, entry)
+                if item.byte_size < self.min_stream_max_size:
+                    mini_streams.append((item, entry))
+                else:
+                    large_streams.append((item, entry))
+
+        # mini streams first to keep the mini stream contiguous
+        for item, entry in mini_streams:
+            Stream(cfb, entry, 'w').write(self.open(item, 'r').read())
+
+        for item, entry in large_streams:
+            s = Stream(cfb, entry, 'w')
+            # allocate up front so the fat chain is created in one pass
+            s.allocate(item.byte_size)
+            for chunk in self.open(item, 'r').iter_chunks(self.sector_size * 256):
+                s.write(chunk)
+
+        cfb.close()
+
     def validate_directory_structure(self):
         for root, storage, stream in self.walk():
             validate_rbtree(root.child())
@@ -2140,6 +2729,8 @@ class CompoundFileBinary(object):
 
         # src_entry.parent.remove_child(src_entry)
 
+        # paths of everything under src change
+        self.path_index.clear()
         src_entry.pop()
 
         src_entry.parent = None
@@ -5,12 +5,18 @@ from __future__ import (
     division,
     )
 
+from bisect import bisect_left, bisect_right
+
 from . import core
 from . utils import register_class
 from . mobid import MobID
 from . dictionary import DataDef
 from .auid import AUID
 
+PID_LENGTH     = 0x0202
+PID_COMPONENTS = 0x1001
+PID_SOURCEID   = 0x1101
+
 class Component(core.AAFObject):
     class_id = AUID("0d010101-0101-0200-060e-2b3402060101")
     __slots__ = ()
@@ -18,6 +24,12 @@ class Component(core.AAFObject):
         self.media_kind = media_kind or 'picture'
         self.length = length or 0
 
+    def property_modified(self, p):
+        if p.pid == PID_LENGTH:
+            # invalidates Sequence.position_index
+            self.root.length_generation += 1
+            self.root.source_generation += 1
+
     @property
     def length(self):
         return self['Length'].value
@@ -64,7 +76,12 @@ class Transition(Component):
 @register_class
 class Sequence(Segment):
     class_id = AUID("0d010101-0101-0f00-060e-2b3402060101")
-    __slots__ = ()
+    __slots__ = ('_position_index')
+
+    def __new__(cls, *args, **kwargs):
+        self = super(Sequence, cls).__new__(cls, *args, **kwargs)
+        self._position_index = None
+        return self
 
     @property
     def components(self):
@@ -73,8 +90,72 @@ class Sequence(Segment):
     def component_at_time(self, edit_unit):
         return self.components[self.index_at_time(edit_unit)]
 
+    def property_modified(self, p):
+        super(Sequence, self).property_modified(p)
+        if p.pid == PID_COMPONENTS:
+            self._position_index = None
+            self.root.source_generation += 1
+
+    def position_index(self):
+        """
+        Returns (positions, transition_indices, transition_max_ends) for bisecting,
+        cached until Components or a component Length is modified. None if positions
+        are not sorted, then index_at_time falls back to walking positions().
+        """
+        generation = self.root.length_generation
+        if self._position_index and self._position_index[0] == generation:
+            return self._position_index[1]
+
+        positions = []
+        transitions = []
+        max_ends = []
+        max_end = None
+        for index, position, component in self.positions():
+            positions.append(position)
+            if isinstance(component, Transition):
+                end = position + component.length
+                if max_end is None or end > max_end:
+                    max_end = end
+                transitions.append(index)
+                max_ends.append(max_end)
+
+        result = (positions, transitions, max_ends)
+        for i in range(2, len(positions)):
+            if positions[i] < positions[i-1]:
+                result = None
+                break
+
+        self._position_index = (generation, result)
+        return result
+
     def index_at_time(self, edit_unit):
 
+        if edit_unit <= 0:
+            return 0
+
+        index = self.position_index()
+        if index is None:
+            return self.walk_index_at_time(edit_unit)
+
+        positions, transitions, max_ends = index
+        if not positions:
+            return None
+
+        # first component past the start that starts at or after edit_unit
+        past = bisect_left(positions, edit_unit, 1)
+
+        # first transition up to it containing edit_unit
+        count = bisect_right(transitions, past)
+        i = bisect_right(max_ends, edit_unit, 0, count)
+        if i < count:
+            index = transitions[i]
+            if index < past or positions[index] <= edit_unit:
+                return index
+
+        return past - 1
+
+    def walk_index_at_time(self, edit_unit):
+
         last_component = None
         last_index = None
 
@@ -97,6 +178,19 @@ class Sequence(Segment):
 
         return last_index
 
+    def source_chains(self):
+        """
+        Returns a list of (component, chain) for every component, chain is the
+        list of segments SourceClip.walk yields, empty for other components.
+        """
+        result = []
+        for component in self.components:
+            if isinstance(component, SourceClip):
+                result.append((component, list(component.walk())))
+            else:
+                result.append((component, []))
+        return result
+
     def positions(self):
         length = 0
         for index, component in enumerate(self.components):
@@ -160,6 +254,29 @@ class SourceReference(Segment):
     def slot(self, value):
         self.slot_id = value.slot_id
 
+    def attach(self, dir_entry):
+        super(SourceReference, self).attach(dir_entry)
+        self.update_reference_index()
+
+    def detaching(self):
+        index = self.root.reference_index
+        if index is not None:
+            index.remove(self.dir.path())
+
+    def property_modified(self, p):
+        super(SourceReference, self).property_modified(p)
+        if p.pid == PID_SOURCEID and self.dir:
+            self.update_reference_index()
+
+    def update_reference_index(self):
+        # see ContentStorage.reference_index
+        index = self.root.reference_index
+        if index is not None:
+            index.add(self.dir.path(), self.mob_id)
+
+# SourceID, SourceMobSlotID and StartTime
+SOURCE_KEY_PIDS = (0x1101, 0x1102, 0x1201)
+
 @register_class
 class SourceClip(SourceReference):
     class_id = AUID("0d010101-0101-1100-060e-2b3402060101")
@@ -179,16 +296,18 @@ class SourceClip(SourceReference):
     def start(self, value):
         self['StartTime'].value = value
 
-    def walk(self):
+    def resolve(self):
+        """
+        Returns the segment this clip references at its start, None if there is
+        none. walk follows it while it is a SourceClip.
+        """
         if not self.slot:
             return
 
         segment = self.slot.segment
 
         if isinstance(segment, SourceClip):
-            yield segment
-            for item in segment.walk():
-                yield item
+            return segment
 
         elif isinstance(segment, Sequence):
             try:
@@ -197,27 +316,61 @@ class SourceClip(SourceReference):
                 print(e)
             else:
                 if isinstance(clip, SourceClip):
-                    yield clip
-                    for item in clip.walk():
-                        yield item
+                    return clip
                 else:
                     raise NotImplementedError("Sequence returned {} not "
                                               "implemented".format(
                                                   type(segment)))
 
-        elif isinstance(segment, EssenceGroup):
-            yield segment
-
-        elif isinstance(segment, Filler):
-            yield segment
-
-        elif isinstance(segment, (OperationGroup, Pulldown)):
-            yield segment
+        elif isinstance(segment, (EssenceGroup, Filler, OperationGroup, Pulldown)):
+            return segment
 
         else:
             raise NotImplementedError("Walking {} not implemented".format(
                                       type(segment)))
 
+    def source_key(self):
+        """
+        Returns (mob_id, slot_id, start) as their raw property data, which is
+        cheaper to get and hash than the decoded values.
+        """
+        key = []
+        for pid in SOURCE_KEY_PIDS:
+            p = self.property_entries.get(pid, None)
+            if p is None or p.data is None:
+                key.append(None)
+            else:
+                key.append(bytes(p.data))
+        return tuple(key)
+
+    def walk(self):
+        """
+        Yields each segment down the source chain. Resolved hops are cached
+        by source_key, see ContentStorage.source_cache.
+        """
+        content = self.root.content
+        read_object = self.root.manager.read_object
+        clip = self
+        while True:
+            cache = content.source_cache()
+            key = clip.source_key()
+            if key in cache:
+                item = cache[key]
+                if item is not None and not isinstance(item, core.AAFObject):
+                    item = read_object(item)
+            else:
+                item = clip.resolve()
+                # keep the path so the cache doesn't hold on to objects
+                cache[key] = item.dir.path() if item is not None and item.dir else item
+
+            if item is None:
+                return
+
+            yield item
+            if not isinstance(item, SourceClip):
+                return
+            clip = item
+
 @register_class
 class Filler(Segment):
     class_id = AUID("0d010101-0101-0900-060e-2b3402060101")
@@ -8,11 +8,49 @@ from __future__ import (
 from . import core
 from .utils import register_class
 from . import mobs
+from . import components
 from . import mxf
 from . import ama
 from . import audio
 from .auid import AUID
 
+PID_MOBS = 0x1901
+
+class SourceReferenceIndex(object):
+    """
+    Maps mob ids to the dir paths of the attached SourceReferences, inside
+    ContentStorage mobs, that reference them.
+    """
+    __slots__ = ('prefix', 'paths', 'mob_ids')
+
+    def __init__(self, content_path):
+        self.prefix = content_path + '/'
+        # mob_id -> set of paths
+        self.paths = {}
+        # path -> mob_id
+        self.mob_ids = {}
+
+    def add(self, path, mob_id):
+        self.remove(path)
+        if mob_id is None or mob_id.int == 0:
+            return
+        if not path.startswith(self.prefix):
+            return
+        self.mob_ids[path] = mob_id
+        self.paths.setdefault(mob_id, set()).add(path)
+
+    def remove(self, path):
+        mob_id = self.mob_ids.pop(path, None)
+        if mob_id is None:
+            return
+        paths = self.paths[mob_id]
+        paths.discard(path)
+        if not paths:
+            del self.paths[mob_id]
+
+    def get(self, mob_id):
+        return self.paths.get(mob_id, ())
+
 @register_class
 class Header(core.AAFObject):
     class_id = AUID("0d010101-0101-2f00-060e-2b3402060101")
@@ -25,7 +63,13 @@ class ContentStorage(core.AAFObject):
     """
 
     class_id = AUID("0d010101-0101-1800-060e-2b3402060101")
-    __slots__ = ()
+    __slots__ = ('_mob_index', '_source_cache')
+
+    def __new__(cls, *args, **kwargs):
+        self = super(ContentStorage, cls).__new__(cls, *args, **kwargs)
+        self._mob_index = None
+        self._source_cache = None
+        return self
 
     @property
     def mobs(self):
@@ -34,39 +78,129 @@ class ContentStorage(core.AAFObject):
         """
         return self['Mobs']
 
+    def property_modified(self, p):
+        if p.pid == PID_MOBS:
+            self._mob_index = None
+            self.root.source_generation += 1
+
+    def mob_index(self):
+        """
+        Returns a dict of mob class to list of mob ids. Classes come from the
+        dir entries of the Mobs set so mobs are not read. Cached until Mobs
+        is modified.
+        """
+        if self._mob_index is not None:
+            return self._mob_index[0]
+
+        p = self.mobs
+        lookup_class = self.root.metadict.lookup_class
+        index = {}
+        for key in p.references:
+            obj = p.objects.get(key, None)
+            if obj is not None:
+                mob_class = type(obj)
+            else:
+                mob_class = lookup_class(p.parent.dir.get(p.index_ref_name(key)).class_id)
+            index.setdefault(mob_class, []).append(key)
+
+        # (usage_generation, keys) of the top level mobs, set by toplevel
+        self._mob_index = [index, None]
+        return index
+
+    def iter_mobs(self, mob_class):
+        """
+        Yields the mobs that are instances of mob_class, only reading those.
+        """
+        p = self.mobs
+        for cls, keys in list(self.mob_index().items()):
+            if issubclass(cls, mob_class):
+                for key in keys:
+                    yield p.read_object(key)
+
     def toplevel(self):
         """
         Convenience generator method that yields only TopLevel :class:`aaf2.mobs.CompositionMob` objects.
         """
-        for mob in self.compositionmobs():
-            if mob.usage == 'Usage_TopLevel':
-                yield mob
+        self.mob_index()
+        generation = self.root.usage_generation
+        cache = self._mob_index[1]
+        if cache is None or cache[0] != generation:
+            keys = [mob.mob_id for mob in self.compositionmobs() if mob.usage == 'Usage_TopLevel']
+            cache = (generation, keys)
+            self._mob_index[1] = cache
+
+        p = self.mobs
+        for key in cache[1]:
+            yield p.read_object(key)
+
+    def reference_index(self):
+        """
+        Returns the :class:`SourceReferenceIndex` of the file. Built in one pass
+        over all mobs when first called, after that SourceReferences update it
+        as they are attached, detached or their SourceID changes.
+        """
+        index = self.root.reference_index
+        if index is not None:
+            return index
+
+        index = SourceReferenceIndex(self.dir.path())
+        for mob in self.mobs:
+            for slot in mob.slots:
+                for item, streams in slot.walk_references():
+                    if isinstance(item, components.SourceReference):
+                        index.add(item.dir.path(), item.mob_id)
+
+        self.root.reference_index = index
+        return index
+
+    def references_to(self, mob_id):
+        """
+        Returns a list of (mob, slot, component) for every SourceReference
+        that references the mob with mob_id, mob_id can also be a Mob.
+        """
+        if isinstance(mob_id, mobs.Mob):
+            mob_id = mob_id.mob_id
+
+        index = self.reference_index()
+        read_object = self.root.manager.read_object
+        result = []
+        for path in sorted(index.get(mob_id)):
+            # /<content>/Mobs{key}/Slots{key}/...
+            names = path[len(index.prefix):].split('/')
+            mob_path = index.prefix + names[0]
+            slot_path = mob_path + '/' + names[1]
+            result.append((read_object(mob_path), read_object(slot_path), read_object(path)))
+        return result
+
+    def source_cache(self):
+        """
+        Returns the dict SourceClip.walk memoizes resolved clips in, keyed by
+        SourceClip.source_key. Cleared when Mobs, Slots, a slot SlotID or
+        Segment, Components or a component Length is modified.
+        """
+        generation = self.root.source_generation
+        if self._source_cache and self._source_cache[0] == generation:
+            return self._source_cache[1]
+        self._source_cache = (generation, {})
+        return self._source_cache[1]
 
     def mastermobs(self):
         """
         Convenience generator method that yields only :class:`aaf2.mobs.MasterMob` objects.
         """
-        for mob in self.mobs:
-            if isinstance(mob, mobs.MasterMob):
-                yield mob
+        return self.iter_mobs(mobs.MasterMob)
 
     def compositionmobs(self):
         """
         Convenience generator method that yields only :class:`aaf2.mobs.CompositionMob` objects.
         """
-
-        for mob in self.mobs:
-            if isinstance(mob, mobs.CompositionMob):
-                yield mob
+        return self.iter_mobs(mobs.CompositionMob)
 
     def sourcemobs(self):
         """
         Convenience generator method that yields only :class:`aaf2.mobs.SourceMob` objects.
         """
-
-        for mob in self.mobs:
-            if isinstance(mob, mobs.SourceMob):
-                yield mob
+        return self.iter_mobs(mobs.SourceMob)
 
     def link_external_mxf(self, path):
         m = mxf.MXFFile(path)
@@ -105,12 +105,16 @@ class AAFObject(object):
             p.data = data
             self.property_entries[pid] = p
 
+        lazy_index = self.root.lazy_index
         for p in self.property_entries.values():
             p.decode()
             if isinstance(p, (properties.StrongRefSetProperty,
                               properties.StrongRefVectorProperty,
                               properties.WeakRefArrayProperty)):
-                p.read_index()
+                if lazy_index:
+                    p.defer_index()
+                else:
+                    p.read_index()
 
     def validate(self):
         missing = []
@@ -136,7 +140,31 @@ class AAFObject(object):
             message = "%s missing the following required properties:\n    %s" % (str(self), "\n    ".join(m))
             raise AAFPropertyError(message)
 
-    def write_properties(self, validate=True):
+    def write_properties(self, validate=True, pids=None):
+        """
+        Writes the properties stream and index streams. If pids is given only
+        the index streams of those properties are rewritten and the properties
+        stream only if one of them isn't an index property.
+        """
+        index_props = []
+        write_stream = pids is None
+        for pid in (self.property_entries if pids is None else pids):
+            p = self.property_entries.get(pid, None)
+            if isinstance(p, (properties.StrongRefSetProperty,
+                              properties.StrongRefVectorProperty,
+                              properties.WeakRefArrayProperty)):
+                index_props.append(p)
+            else:
+                write_stream = True
+
+        if write_stream:
+            self.write_properties_stream(validate)
+
+        # write index's
+        for p in index_props:
+            p.write_index()
+
+    def write_properties_stream(self, validate=True):
         if validate:
             self.validate()
 
@@ -169,22 +197,33 @@ class AAFObject(object):
 
         s.write(f.getvalue())
         s.truncate()
-        # write index's
-        for p in self.property_entries.values():
-            if isinstance(p, (properties.StrongRefSetProperty,
-                              properties.StrongRefVectorProperty,
-                              properties.WeakRefArrayProperty)):
-                # print('writing index', self, p)
-                p.write_index()
 
 
+    def property_modified(self, p):
+        """
+        Called after property p of this object is written to.
+        """
+        pass
+
+    def detaching(self):
+        """
+        Called by detach for every object in the detached tree, while its
+        dir is still set.
+        """
+        pass
+
     def detach(self, delete=False):
+        # invalidates cached WeakRefProperty targets
+        self.root.weakref_generation += 1
+
         items = []
         for item, streams in self.walk_references(topdown=True):
             # store reference not sure if necessary
             items.append(item)
 
             for pid, p in item.property_entries.items():
+                # deferred indexes can't be read once detached from the dir
+                p.load_index()
                 if isinstance(p, (properties.StrongRefProperty,
                                   properties.StrongRefVectorProperty,
                                   properties.StrongRefSetProperty,
@@ -193,6 +232,8 @@ class AAFObject(object):
                     p.detach()
 
             if item.dir:
+                item.detaching()
+
                 # remove child from object manager
                 self.root.manager.pop(item.dir.path(), None)
 
@@ -295,33 +336,34 @@ class AAFObject(object):
         return keys
 
     def get(self, key, default=None, allkeys=True):
-        for item in self.properties():
-            if item.name == key:
-                return item
-        if allkeys == False:
+        classdef = self.classdef
+        if classdef is None:
             return default
 
-        classdef = self.classdef
-        for propertydef in classdef.all_propertydefs():
-            if propertydef.property_name == key:
-                fmt = propertydef.store_format
+        propertydefs = classdef.lookup_propertydefs(key)
+        property_entries = self.property_entries
+        for pid, propertydef in propertydefs:
+            p = property_entries.get(pid, None)
+            if p is not None:
+                return p
 
-                # Workaround, for OperationDef Parameters
-                # AAF SDK uses a StrongRefSetProperty
-                # Spec says its suppose to be a StrongRefVectorProperty
-                if propertydef.auid == OPERATIONGROUP_PARAMETERS_AUID:
-                    fmt = properties.SF_STRONG_OBJECT_REFERENCE_SET
+        if allkeys == False or not propertydefs:
+            return default
 
-                p = property_formats[fmt](self, propertydef.pid, fmt)
-                return p
+        pid, propertydef = propertydefs[0]
+        fmt = propertydef.store_format
 
-        return default
+        # Workaround, for OperationDef Parameters
+        # AAF SDK uses a StrongRefSetProperty
+        # Spec says its suppose to be a StrongRefVectorProperty
+        if propertydef.auid == OPERATIONGROUP_PARAMETERS_AUID:
+            fmt = properties.SF_STRONG_OBJECT_REFERENCE_SET
 
-    def getvalue(self, key, default=None):
-        if not key in self.keys():
-            return default
+        p = property_formats[fmt](self, pid, fmt)
+        return p
 
-        p = self.get(key, None)
+    def getvalue(self, key, default=None):
+        p = self.get(key, None, allkeys=False)
         if p is None:
             return default
         return p.value
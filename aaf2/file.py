@@ -13,6 +13,7 @@ from uuid import uuid4
 import sys
 import datetime
 import weakref
+import shutil
 from .utils import (
     read_u8,
     read_u16le,
@@ -26,7 +27,7 @@ from .auid import AUID
 from .cfb import (CompoundFileBinary, DirEntry)
 from .core import AAFObject
 from .metadict import MetaDictionary
-from .cache import LRUCacheDict
+from .cache import LRUCacheDict, ThreadSafeLRUCacheDict
 
 class AAFFactory(object):
 
@@ -65,12 +66,19 @@ class AAFFactory(object):
 
 class AAFObjectManager(object):
 
-    def __init__(self, root):
+    def __init__(self, root, cache_size=512):
         self.root = root
         self.path_cache = weakref.WeakValueDictionary()
-        self.lru_cache = LRUCacheDict()
+        if root.cfb.threadsafe:
+            self.lru_cache = ThreadSafeLRUCacheDict(cache_size)
+        else:
+            self.lru_cache = LRUCacheDict(cache_size)
+        self.hits = 0
+        self.misses = 0
         # to hold onto modified objects
         self.modified = {}
+        # pids of modified properties per path, None if whole object is modified
+        self.modified_pids = {}
 
     def create_temp_dir(self):
         return self.root.cfb.makedirs("/tmp/" + str(uuid4()).replace('-', '/'))
@@ -79,17 +87,27 @@ class AAFObjectManager(object):
         if self.root.cfb.exists("/tmp"):
             self.root.cfb.rmtree("/tmp")
 
-    def add_modified(self, obj):
+    def add_modified(self, obj, prop=None):
         if self.root.mode == 'rb':
             raise ValueError("cannot modify read only file")
 
         path = obj.dir.path()
+        if prop is None:
+            self.modified_pids[path] = None
+        elif self.modified.get(path, None) is not obj:
+            self.modified_pids[path] = set([prop.pid])
+        else:
+            pids = self.modified_pids.get(path, None)
+            if pids is not None:
+                pids.add(prop.pid)
+
         self.modified[path] = obj
         self[path] = obj
 
     def pop(self, path, default=None):
         cached_obj = self.path_cache.pop(path, default)
         modified_obj = self.modified.pop(path, default)
+        self.modified_pids.pop(path, None)
         if path in self.lru_cache:
             del self.lru_cache[path]
 
@@ -99,20 +117,35 @@ class AAFObjectManager(object):
         self.lru_cache[key] = value
         self.path_cache[key] = value
 
+    def stats(self):
+        stats = self.lru_cache.stats()
+        stats['hits'] = self.hits
+        stats['misses'] = self.misses
+        return stats
+
+    def reset_stats(self):
+        self.lru_cache.reset_stats()
+        self.hits = 0
+        self.misses = 0
+
     def read_object(self, path):
         if isinstance(path, DirEntry):
             dir_entry = path
             path = dir_entry.path()
             obj = self.path_cache.get(path, None)
             if obj is not None:
+                self.hits += 1
                 return obj
         else:
             obj = self.path_cache.get(path, None)
             if obj is not None:
+                self.hits += 1
                 return obj
 
             dir_entry = self.root.cfb.find(path)
 
+        self.misses += 1
+
         if dir_entry is None:
             raise ValueError("cannot find path: %s" % path)
 
@@ -134,7 +167,7 @@ class AAFObjectManager(object):
         written = []
         for path, obj in self.modified.items():
             try:
-                obj.write_properties()
+                obj.write_properties(pids=self.modified_pids.get(path, None))
                 written.append(path)
             except:
                 print("failed to write: %s %s" %  (str(path), str(obj)))
@@ -143,6 +176,7 @@ class AAFObjectManager(object):
         # no longer need to be in modified
         for path in written:
             self.modified.pop(path)
+            self.modified_pids.pop(path, None)
 
 class AAFFile(object):
     """
@@ -166,9 +200,31 @@ class AAFFile(object):
     Opening in memory BytesIO file::
 
         with aaf.open() as f:
+
+    Opening existing AAF file readonly, memory mapping the file::
+
+        with aaf.open('/path/to/aaf_file.aaf', 'r', mmap=True) as f:
+
+    Opening existing AAF file readonly, so multiple threads can read from it::
+
+        with aaf.open('/path/to/aaf_file.aaf', 'r', threadsafe=True) as f:
+
+    Opening existing AAF file readonly, parsing the whole directory up front::
+
+        with aaf.open('/path/to/aaf_file.aaf', 'r', dir_table=True) as f:
+
+    Opening existing AAF file, only reading collection index streams when they are first used::
+
+        with aaf.open('/path/to/aaf_file.aaf', 'r', lazy_index=True) as f:
+
+    Tuning cache sizes for large files, see :meth:`cache_stats`::
+
+        with aaf.open('/path/to/aaf_file.aaf', 'r', sector_cache_size=4096, object_cache_size=8192) as f:
     """
 
-    def __init__(self, path=None, mode='r', sector_size=4096, extensions=True, buffering=io.DEFAULT_BUFFER_SIZE):
+    def __init__(self, path=None, mode='r', sector_size=4096, extensions=True, buffering=io.DEFAULT_BUFFER_SIZE,
+                 mmap=False, threadsafe=False, write_buffer_size=4*1024*1024,
+                 sector_cache_size=512, object_cache_size=512, dir_table=False, lazy_index=False):
 
         if mode in ('r', 'rb'):
             mode = 'rb'
@@ -185,9 +241,27 @@ class AAFFile(object):
         else:
             self.f = io.open(path, mode, buffering=buffering)
 
-        self.cfb = CompoundFileBinary(self.f, self.mode, sector_size=sector_size)
+        self.cfb = CompoundFileBinary(self.f, self.mode, sector_size=sector_size, mmap=mmap, threadsafe=threadsafe,
+                                      write_buffer_size=write_buffer_size,
+                                      sector_cache_size=sector_cache_size,
+                                      dir_table=dir_table)
+        self.lazy_index = lazy_index
         self.weakref_table = []
-        self.manager = AAFObjectManager(self)
+        # tuple(pid_path) -> index in weakref_table
+        self.weakref_table_index = {}
+        # bumped when objects are detached, see WeakRefProperty.value
+        self.weakref_generation = 0
+        # bumped when a component Length is modified, see Sequence.position_index
+        self.length_generation = 0
+        # bumped when a slot SlotID is modified, see Mob.slot_index
+        self.slot_id_generation = 0
+        # bumped when a CompositionMob UsageCode is modified, see ContentStorage.toplevel
+        self.usage_generation = 0
+        # bumped when anything SourceClip.resolve reads is modified, see ContentStorage.source_cache
+        self.source_generation = 0
+        # see ContentStorage.reference_index
+        self.reference_index = None
+        self.manager = AAFObjectManager(self, object_cache_size)
         self.create = AAFFactory(self)
         self.is_open = True
 
@@ -278,12 +352,12 @@ class AAFFile(object):
         return root, p
 
     def weakref_index(self, pid_path):
-
-        if pid_path in self.weakref_table:
-            index = self.weakref_table.index(pid_path)
-        else:
+        key = tuple(pid_path)
+        index = self.weakref_table_index.get(key, None)
+        if index is None:
             index = len(self.weakref_table)
             self.weakref_table.append(pid_path)
+            self.weakref_table_index[key] = index
 
         return index
 
@@ -299,12 +373,15 @@ class AAFFile(object):
         pid_count = read_u32le(f)
 
         self.weakref_table = []
+        self.weakref_table_index = {}
         path = []
         for i in range(pid_count):
             pid = read_u16le(f)
             if pid != 0:
                 path.append(pid)
             else:
+                # keep the first index if a path is listed twice, like list.index
+                self.weakref_table_index.setdefault(tuple(path), len(self.weakref_table))
                 self.weakref_table.append(path)
                 path = []
         assert len(self.weakref_table) == path_count
@@ -336,16 +413,59 @@ class AAFFile(object):
     def dump(self):
         self.root.dump()
 
-    def save(self):
+    def cache_stats(self):
+        """
+        Returns hit, miss and eviction counters for the sector, directory and
+        object caches, and total bytes read from the file.
+        """
+        stats = self.cfb.stats()
+        stats['object_cache'] = self.manager.stats()
+        return stats
+
+    def reset_cache_stats(self):
+        """
+        Resets all cache counters to zero.
+        """
+        self.cfb.sector_cache.reset_stats()
+        self.cfb.children_cache.reset_stats()
+        self.cfb.bytes_read = 0
+        self.manager.reset_stats()
+
+    def save(self, flush=False):
         """
         Writes current changes to disk and flushes modified objects in the
-        AAFObjectManager
+        AAFObjectManager. If flush is True the header, fat tables and directory
+        are written too, leaving the file readable on disk while it stays open.
+        Only the table sectors that changed since the last flush are rewritten,
+        so flushing often stays cheap.
         """
         if self.mode in ("wb+", 'rb+'):
             if not self.is_open:
                 raise IOError("file closed")
             self.write_reference_properties()
             self.manager.write_objects()
+            if flush:
+                self.cfb.flush()
+
+    def save_as(self, path, compact=True):
+        """
+        Writes a copy of the file, including unsaved changes, to path.
+        If compact is True the copy is defragmented and /tmp is dropped,
+        see :meth:`aaf2.cfb.CompoundFileBinary.compact`, otherwise the file
+        is copied as is. This file stays open.
+        """
+        if not self.is_open:
+            raise IOError("file closed")
+
+        # compact copies from the in memory tables, a plain copy needs them
+        # on disk first
+        self.save(flush=not compact)
+        with io.open(path, 'wb+') as f:
+            if compact:
+                self.cfb.compact(f)
+            else:
+                self.f.seek(0)
+                shutil.copyfileobj(self.f, f)
 
     def close(self):
         """
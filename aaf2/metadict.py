@@ -5,7 +5,6 @@ from __future__ import (
     division,
     )
 import traceback
-from io import BytesIO
 from .exceptions import AAFPropertyError
 from . import types
 from .model import classdefs
@@ -14,8 +13,8 @@ from . import properties
 from .auid import AUID
 
 from . import core
-from .utils import (register_class, read_u16le, decode_utf16le,
-                    encode_utf16le, encode_u16le, str2auid,
+from .utils import (register_class, decode_utf16le,
+                    encode_utf16le, encode_u16le, decode_u16le, str2auid,
                     AAFClaseID_dict, AAFClassName_dict)
 
 PID_NAME      = 0x0006
@@ -34,7 +33,7 @@ sentinel = object()
 @register_class
 class PropertyDef(core.AAFObject):
     class_id = AUID("0d010101-0202-0000-060e-2b3402060101")
-    __slots__ = ('_typedef_id', '_auid', '_property_name')
+    __slots__ = ('_typedef_id', '_auid', '_property_name', '_pid')
 
     def __new__(cls, root=None, name=None, auid=None, pid=None, typedef=None, optional=None, unique=None):
         self = super(PropertyDef, cls).__new__(cls)
@@ -42,6 +41,7 @@ class PropertyDef(core.AAFObject):
         self._typedef_id = None
         self._auid = None
         self._property_name = name
+        self._pid = None
         if root:
             properties.add_string_property(self, PID_NAME, name)
             properties.add_bool_property(self, PID_OPTIONAL, optional)
@@ -78,11 +78,28 @@ class PropertyDef(core.AAFObject):
 
     @property
     def pid(self):
-        return read_u16le(BytesIO(self.property_entries[PID_PID].data))
+        # cached against the data so setting the LocalIdentification property invalidates it
+        data = self.property_entries[PID_PID].data
+        cache = self._pid
+        if cache is None or cache[0] is not data:
+            cache = (data, decode_u16le(data))
+            self._pid = cache
+        return cache[1]
 
     @pid.setter
     def pid(self, value):
         self.property_entries[PID_PID].data = encode_u16le(value)
+        self.pid_modified()
+
+    def pid_modified(self):
+        # invalidates ClassDef.lookup_propertydefs
+        metadict = getattr(self.root, 'metadict', None)
+        if metadict is not None:
+            metadict.propertydefs_generation += 1
+
+    def property_modified(self, p):
+        if p.pid == PID_PID:
+            self.pid_modified()
 
     @property
     def auid(self):
@@ -125,12 +142,14 @@ class PropertyDef(core.AAFObject):
 @register_class
 class ClassDef(core.AAFObject):
     class_id = AUID("0d010101-0201-0000-060e-2b3402060101")
-    __slots__ = ('propertydef_by_pid')
+    __slots__ = ('propertydef_by_pid', '_propertydefs_by_name')
 
     def __new__(cls, root=None, name=None, class_auid=None, parent_auid=None, concrete=None):
         self = super(ClassDef, cls).__new__(cls)
         self.root = root
         self.propertydef_by_pid = {}
+        # (metadict propertydefs_generation, {name: propertydefs})
+        self._propertydefs_by_name = None
         if root:
             properties.add_string_property(self, PID_NAME, name)
             properties.add_auid_property(self, PID_AUID, class_auid)
@@ -250,6 +269,11 @@ class ClassDef(core.AAFObject):
         # # this is done low level to avoid recursion errors
         properties.add2set(self, PID_PROPERTIES, p.auid, p)
         self.propertydef_by_pid[pid] = p
+
+        # subclasses cache this classdef's propertydefs too
+        metadict = getattr(self.root, 'metadict', None)
+        if metadict is not None:
+            metadict.propertydefs_generation += 1
         return p
 
     def relatives(self):
@@ -268,6 +292,23 @@ class ClassDef(core.AAFObject):
             for p in classdef.propertydefs:
                 yield p
 
+    def lookup_propertydefs(self, name):
+        """
+        Returns a tuple of ``(pid, PropertyDef)`` pairs named name, from this
+        class and its parents, nearest class first.
+        """
+        generation = self.root.metadict.propertydefs_generation
+        cache = self._propertydefs_by_name
+        if cache is None or cache[0] != generation:
+            by_name = {}
+            for p in self.all_propertydefs():
+                key = p.property_name
+                by_name[key] = by_name.get(key, ()) + ((p.pid, p),)
+            cache = (generation, by_name)
+            self._propertydefs_by_name = cache
+
+        return cache[1].get(name, ())
+
     def get_propertydef_from_pid(self, pid, default=None):
 
         for classdef in self.relatives():
@@ -299,6 +340,74 @@ root_types = {
 PID_CLASSDEFS = 0x0003
 PID_TYPEDEFS  = 0x0004
 
+class ModelRoot(object):
+    """
+    Stands in for AAFFile while building the default model, see default_model.
+    """
+    writeable = True
+    length_generation = 0
+    slot_id_generation = 0
+    usage_generation = 0
+    source_generation = 0
+
+    def __init__(self):
+        self.weakref_table = []
+        self.metadict = None
+
+    def weakref_index(self, pid_path):
+        if pid_path in self.weakref_table:
+            return self.weakref_table.index(pid_path)
+        self.weakref_table.append(pid_path)
+        return len(self.weakref_table) - 1
+
+_default_model = None
+
+def default_model():
+    """
+    Returns a MetaDictionary of the builtin data model. It is only built once per
+    process and is shared by read only files, so it must not be modified.
+    """
+    global _default_model
+    if _default_model is None:
+        root = ModelRoot()
+        root.metadict = MetaDictionary(root)
+        _default_model = root.metadict
+    return _default_model
+
+def set_model_root(obj, root):
+    obj.root = root
+    for p in obj.property_entries.values():
+        if isinstance(p, properties.StrongRefSetProperty):
+            for item in p.objects.values():
+                set_model_root(item, root)
+
+    if isinstance(obj, ClassDef):
+        obj.propertydef_by_pid = dict((p.pid, p) for p in obj.propertydefs)
+
+class ModelDefs(dict):
+    """
+    Maps names or auids to ClassDefs or TypeDefs. Entries missing from the
+    dict are copied from the default model on first access.
+    """
+    def __init__(self, metadict, model_defs):
+        super(ModelDefs, self).__init__()
+        self.metadict = metadict
+        self.model_defs = model_defs
+
+    def __missing__(self, key):
+        value = self.metadict.model_object(self.model_defs[key])
+        self[key] = value
+        return value
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.model_defs
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
 @register_class
 class MetaDictionary(core.AAFObject):
     class_id = AUID("0d010101-0225-0000-060e-2b3402060101")
@@ -309,6 +418,24 @@ class MetaDictionary(core.AAFObject):
         properties.add_strongref_set_property(self, PID_CLASSDEFS, "ClassDefinitions", PID_AUID)
         properties.add_strongref_set_property(self, PID_TYPEDEFS, "TypeDefinitions", PID_AUID)
 
+        self.local_pids = set()
+        self.next_pid = 0xFFFF
+
+        # bumped when propertydefs are added, invalidates ClassDef.lookup_propertydefs
+        self.propertydefs_generation = 0
+
+        if not root.writeable:
+            # nothing is written, so only copy the defs that get used
+            model = default_model()
+            self.model_objects = {}
+            self.classdefs_by_name = ModelDefs(self, model.classdefs_by_name)
+            self.classdefs_by_auid = ModelDefs(self, model.classdefs_by_auid)
+            self.typedefs_by_name = ModelDefs(self, model.typedefs_by_name)
+            self.typedefs_by_auid = ModelDefs(self, model.typedefs_by_auid)
+            self.typedefs_classes = dict(model.typedefs_classes)
+            self.local_pids = set(model.local_pids)
+            return
+
         self.classdefs_by_name = {}
         self.classdefs_by_auid = {}
         self.typedefs_by_name = {}
@@ -316,9 +443,6 @@ class MetaDictionary(core.AAFObject):
 
         self.typedefs_classes = {}
 
-        self.local_pids = set()
-        self.next_pid = 0xFFFF
-
         for name, args in root_classes.items():
             self.register_classdef(name, *args)
 
@@ -332,6 +456,17 @@ class MetaDictionary(core.AAFObject):
         self.register_typedef_model({'strongrefs': root_types})
         self.register_typedef_model(base_typedefs.__dict__)
 
+    def model_object(self, model_obj):
+        """
+        Returns this file's copy of a ClassDef or TypeDef from the default model.
+        """
+        obj = self.model_objects.get(id(model_obj), None)
+        if obj is None:
+            obj = model_obj.copy()
+            set_model_root(obj, self.root)
+            self.model_objects[id(model_obj)] = obj
+        return obj
+
     def register_typedef_model(self, typedef_model):
 
         for cat, classobj in types.categories.items():
@@ -484,6 +619,8 @@ class MetaDictionary(core.AAFObject):
 
             classdef.propertydef_by_pid = propertydef_by_pid
 
+        self.propertydefs_generation += 1
+
 
         # add typedefs not defined by file data model
         if self.root.writeable:
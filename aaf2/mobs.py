@@ -18,6 +18,9 @@ from . import audio
 from .rational import AAFRational
 from .auid import AUID
 
+PID_SLOTS     = 0x4403
+PID_USAGECODE = 0x4408
+
 @register_class
 class Mob(core.AAFObject):
     """
@@ -25,7 +28,12 @@ class Mob(core.AAFObject):
     """
 
     class_id = AUID("0d010101-0101-3400-060e-2b3402060101")
-    __slots__ = ()
+    __slots__ = ('_slot_index')
+
+    def __new__(cls, *args, **kwargs):
+        self = super(Mob, cls).__new__(cls, *args, **kwargs)
+        self._slot_index = None
+        return self
 
     def __init__(self, name=None):
         self.name = name or "Mob"
@@ -75,28 +83,48 @@ class Mob(core.AAFObject):
     def slots(self):
         return self['Slots']
 
+    def property_modified(self, p):
+        if p.pid == PID_SLOTS:
+            self._slot_index = None
+            self.root.source_generation += 1
+
+    def slot_index(self):
+        """
+        Returns (dict of slot_id to index in slots, next free slot_id), cached
+        until Slots or a slot SlotID is modified.
+        """
+        generation = self.root.slot_id_generation
+        if self._slot_index and self._slot_index[0] == generation:
+            return self._slot_index[1]
+
+        index = {}
+        for i, slot in enumerate(self.slots):
+            index.setdefault(slot.slot_id, i)
+
+        next_slot_id = max([slot_id for slot_id in index if slot_id is not None] or [0]) + 1
+        self._slot_index = (generation, (index, next_slot_id))
+        return self._slot_index[1]
+
     def slot_at(self, slot_id):
-        for slot in self.slots:
-            if slot.slot_id == slot_id:
-                return slot
+        index = self.slot_index()[0]
+        if slot_id in index:
+            return self.slots[index[slot_id]]
         raise IndexError("No SlotID: %s" % str(slot_id))
 
     def create_timeline_slot(self, edit_rate, slot_id=None):
-        slots = [slot.slot_id for slot in self.slots]
-        slots.sort()
+        index, next_slot_id = self.slot_index()
         if slot_id is None:
-            start = 1
-            if slots and slots[0] == 0:
-                start = 0
-
-            for i, e in enumerate(slots + [None], start):
-                if i != e:
-                    slot_id = i
-        elif slot_id in slots:
+            slot_id = next_slot_id
+        elif slot_id in index:
             raise ValueError("slot id: %d already exists" % slot_id)
 
         slot = self.root.create.TimelineMobSlot(slot_id, edit_rate=edit_rate)
         self.slots.append(slot)
+
+        # only this mob changed, so update the index instead of rebuilding it
+        index[slot_id] = len(self.slots) - 1
+        next_slot_id = max(next_slot_id, slot_id + 1)
+        self._slot_index = (self.root.slot_id_generation, (index, next_slot_id))
         return slot
 
     def create_empty_sequence_slot(self, edit_rate, slot_id=None,  media_kind=None):
@@ -154,6 +182,12 @@ class CompositionMob(Mob):
     class_id = AUID("0d010101-0101-3500-060e-2b3402060101")
     __slots__ = ()
 
+    def property_modified(self, p):
+        super(CompositionMob, self).property_modified(p)
+        if p.pid == PID_USAGECODE:
+            # invalidates ContentStorage.toplevel
+            self.root.usage_generation += 1
+
 @register_class
 class MasterMob(Mob):
     class_id = AUID("0d010101-0101-3600-060e-2b3402060101")
@@ -405,10 +439,7 @@ class SourceMob(Mob):
 
             read_size = channels * int(float(sample_rate)) * sample_size
             stream = self.essence.open('r')
-            while True:
-                data = stream.read(read_size)
-                if not data:
-                    break
+            for data in stream.iter_chunks(read_size):
                 a.writeframesraw(data)
 
         finally:
@@ -10,6 +10,9 @@ from .utils import register_class
 from .auid import AUID
 from . import components
 
+PID_SLOTID  = 0x4801
+PID_SEGMENT = 0x4803
+
 @register_class
 class MobSlot(core.AAFObject):
     class_id = AUID("0d010101-0101-3800-060e-2b3402060101")
@@ -24,6 +27,14 @@ class MobSlot(core.AAFObject):
         self.name = name or ""
         self.segment = segment
 
+    def property_modified(self, p):
+        if p.pid == PID_SLOTID:
+            # invalidates Mob.slot_index
+            self.root.slot_id_generation += 1
+            self.root.source_generation += 1
+        elif p.pid == PID_SEGMENT:
+            self.root.source_generation += 1
+
     @property
     def segment(self):
         return self['Segment'].value
@@ -74,9 +74,34 @@ class Property(object):
         self._propertydef = None
         self.parent = parent
 
+    # slots set by read_index, see defer_index
+    index_attrs = ()
+
     def format_name(self):
         return str(property_formats[self.format].__name__)
 
+    def defer_index(self):
+        """
+        Unsets the index attributes so the index stream is only read when
+        one of them is first accessed.
+        """
+        for name in self.index_attrs:
+            delattr(self, name)
+
+    def load_index(self):
+        """
+        Reads the index stream now if it was deferred.
+        """
+        if self.index_attrs:
+            getattr(self, self.index_attrs[0])
+
+    def __getattr__(self, name):
+        # only called for unset attributes
+        if name in self.index_attrs:
+            self.read_index()
+            return getattr(self, name)
+        raise AttributeError(name)
+
     @property
     def attached(self):
         if self.parent.dir:
@@ -93,8 +118,9 @@ class Property(object):
         pass
 
     def mark_modified(self):
+        self.parent.property_modified(self)
         if self.attached:
-            self.parent.root.manager.add_modified(self.parent)
+            self.parent.root.manager.add_modified(self.parent, self)
 
     @property
     def propertydef(self):
@@ -165,11 +191,16 @@ class Property(object):
     def add_pid_entry(self):
         if not self.pid in self.parent.property_entries:
             self.parent.property_entries[self.pid] = self
+            # properties stream entry list changed
+            if self.attached and self.writeable:
+                self.parent.root.manager.add_modified(self.parent)
         return self
 
     def remove_pid_entry(self):
         if self.pid in self.parent.property_entries:
             del self.parent.property_entries[self.pid]
+            if self.attached and self.writeable:
+                self.parent.root.manager.add_modified(self.parent)
 
     def __repr__(self):
         name = self.name
@@ -192,14 +223,11 @@ class StreamProperty(Property):
         a = self.open('r')
         b = p.open("w")
 
-        byte_size = a.dir.byte_size
         read_size = self.parent.root.cfb.sector_size
 
         # copy stream data
-        while byte_size > 0:
-            d = a.read(read_size)
-            b.write(d)
-            byte_size -= read_size
+        for chunk in a.iter_chunks(read_size):
+            b.write(chunk)
 
         return p
 
@@ -398,6 +426,7 @@ class StrongRefProperty(Property):
 
 class StrongRefVectorProperty(Property):
     __slots__ = ('references', 'next_free_key', 'last_free_key','objects', '_index_name')
+    index_attrs = ('references', 'next_free_key', 'last_free_key')
     def __init__(self, parent, pid, format, version=PROPERTY_VERSION):
         super(StrongRefVectorProperty, self).__init__(parent, pid, format, version)
         self.references = []
@@ -672,6 +701,7 @@ class StrongRefVectorProperty(Property):
 
 class StrongRefSetProperty(Property):
     __slots__ = ('references', 'index_name', 'next_free_key', 'last_free_key', 'key_pid', 'key_size', 'objects')
+    index_attrs = ('references', 'next_free_key', 'last_free_key', 'key_pid', 'key_size')
     def __init__(self, parent, pid, format, version=PROPERTY_VERSION):
         super(StrongRefSetProperty, self).__init__(parent, pid, format, version)
 
@@ -743,6 +773,7 @@ class StrongRefSetProperty(Property):
         index_fmt  = struct.Struct(str('<' + fmt * count))
         index_data = index_fmt.unpack(f.read())
 
+        self.references = {}
         for i in range(count):
             index = i * 3
 
@@ -845,6 +876,8 @@ class StrongRefSetProperty(Property):
         self.objects[new_key] = obj
 
         obj.unique_property.data = new_key.bytes_le
+        # weakrefs to old_key must not resolve to obj anymore
+        self.parent.root.weakref_generation += 1
 
     @writeonly
     def extend(self, values):
@@ -976,23 +1009,26 @@ def resolve_weakref(p, ref):
         return p.parent.root.resovle_weakref(p.weakref_index, p.key_pid, ref)
 
 class WeakRefProperty(Property):
-    __slots__ = ('weakref_index', 'key_pid', 'key_size', 'ref')
+    __slots__ = ('weakref_index', 'key_pid', 'key_size', 'ref', '_target')
     def __init__(self, parent, pid, format, version=PROPERTY_VERSION):
         super(WeakRefProperty, self).__init__(parent, pid, format, version)
         self.weakref_index = None
         self.key_pid = None
         self.key_size = None
         self.ref = None
+        # (root.weakref_generation, weakref to resolved object)
+        self._target = None
 
     def copy(self, parent):
         p = super(WeakRefProperty, self).copy(parent)
         p.weakref_index = self.weakref_index
-        p.key_pid = self.pid
+        p.key_pid = self.key_pid
         p.key_size = self.key_size
         p.ref = self.ref
         return p
 
     def decode(self):
+        self._target = None
         f = BytesIO(self.data)
         self.weakref_index = read_u16le(f)
         self.key_pid = read_u16le(f)
@@ -1024,7 +1060,16 @@ class WeakRefProperty(Property):
 
     @property
     def value(self):
-        return resolve_weakref(self, self.ref)
+        generation = self.parent.root.weakref_generation
+        if self._target is not None and self._target[0] == generation:
+            target = self._target[1]()
+            if target is not None:
+                return target
+
+        target = resolve_weakref(self, self.ref)
+        if target is not None:
+            self._target = (generation, weakref.ref(target))
+        return target
 
     @property
     def pid_path(self):
@@ -1048,11 +1093,13 @@ class WeakRefProperty(Property):
             self.weakref_index = self.parent.root.weakref_index(self.pid_path)
 
         self.ref = value.unique_key
+        self._target = None
         self.data = self.encode()
         self.add_pid_entry()
 
 class WeakRefArrayProperty(Property):
     __slots__ = ('references', 'index_name', 'weakref_index', 'key_pid', 'key_size')
+    index_attrs = ('references', 'weakref_index', 'key_pid', 'key_size')
     def __init__(self, parent, pid, format, version=PROPERTY_VERSION):
         super(WeakRefArrayProperty, self).__init__(parent, pid, format, version)
         self.references = []
@@ -1092,6 +1139,7 @@ class WeakRefArrayProperty(Property):
         self.key_size = read_u8(f)
         assert self.key_size in (16, 32)
 
+        self.references = []
         for i in range(count):
             if self.key_size == 16:
                 key = AUID(bytes_le=f.read(self.key_size))
@@ -1165,7 +1213,8 @@ class WeakRefArrayProperty(Property):
 
     @writeonly
     def clear(self):
-        self.references = []
+        # in place, so a deferred index is loaded first and doesn't overwrite this later
+        del self.references[:]
 
     @property
     def value(self):
@@ -16,8 +16,9 @@ from .exceptions import AAFPropertyError
 from .auid import AUID
 
 import datetime
+import array
 
-from struct import (unpack, pack)
+from struct import (unpack, pack, Struct)
 from .utils import register_class, decode_utf16le, encode_utf16le, encode_utf16_array, encode_auid_array
 
 if sys.version_info.major >= 3:
@@ -99,6 +100,15 @@ class TypeDefInt(TypeDef):
     def byte_size(self):
         return self.size
 
+    @property
+    def format_char(self):
+        fmt = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}.get(self.size, None)
+        if fmt is None:
+            raise AAFPropertyError("unknown integer size: %d" % self.size)
+        if self.signed:
+            fmt = fmt.lower()
+        return fmt
+
     def pack_format(self, elements=1):
         fmt = ""
         if self.size == 1:
@@ -206,6 +216,8 @@ PID_ENUM_TYPE    = 0x0014
 PID_ENUM_NAMES   = 0x0015
 PID_ENUM_VALUES  = 0x0016
 
+BOOLEAN_AUID = AUID("01040100-0000-0000-060e-2b3401040101")
+
 @register_class
 class TypeDefEnum(TypeDef):
     class_id = AUID("0d010101-0207-0000-060e-2b3402060101")
@@ -263,30 +275,45 @@ class TypeDefEnum(TypeDef):
         fmt = b"<%dq" % len(values)
         self.property_entries[PID_ENUM_VALUES].data = pack(fmt, *values)
 
-    def decode(self, data):
-
+    def from_value(self, index):
+        """
+        Returns the element name of integer value index.
+        """
         # Boolean
-        if self.auid == AUID("01040100-0000-0000-060e-2b3401040101"):
-            return data == b'\x01'
+        if self.auid == BOOLEAN_AUID:
+            return index == 1
 
-        typedef = self.element_typedef
-        index = typedef.decode(data)
         return self.elements[index]
 
-    def encode(self, data):
+    def to_value(self, data):
+        """
+        Returns the integer value of element name or value data.
+        """
         # Boolean
-        if self.auid == AUID("01040100-0000-0000-060e-2b3401040101"):
-            return b'\x01' if data else b'\x00'
+        if self.auid == BOOLEAN_AUID:
+            return 1 if data else 0
 
-        typedef = self.element_typedef
         for index, value in self.elements.items():
             if value == data:
-                return typedef.encode(index)
+                return index
             if index == data:
-                return typedef.encode(index)
+                return index
 
         raise AAFPropertyError("invalid enum: %s" % str(data))
 
+    def decode(self, data):
+
+        # Boolean
+        if self.auid == BOOLEAN_AUID:
+            return data == b'\x01'
+
+        typedef = self.element_typedef
+        return self.from_value(typedef.decode(data))
+
+    def encode(self, data):
+        typedef = self.element_typedef
+        return typedef.encode(self.to_value(data))
+
 def iter_utf16_array(data):
     start = 0
     data = bytearray(data)
@@ -295,6 +322,76 @@ def iter_utf16_array(data):
             yield data[start:i].decode("utf-16le")
             start = i+2
 
+def int_array(typedef, data):
+    """
+    Returns data as an array.array of typedef integers or None if the
+    platform has no array typecode of that size.
+    """
+    size = typedef.size
+    for typecode in ('bhilq' if typedef.signed else 'BHILQ'):
+        try:
+            result = array.array(str(typecode))
+        except ValueError:
+            continue
+        if result.itemsize == size:
+            if data:
+                if hasattr(result, 'frombytes'):
+                    result.frombytes(bytes(data))
+                else:
+                    result.fromstring(bytes(data))
+                if sys.byteorder == 'big':
+                    result.byteswap()
+            return result
+
+def iter_record_values(record_struct, data, count):
+    if hasattr(record_struct, 'iter_unpack'):
+        return record_struct.iter_unpack(data[:count * record_struct.size])
+    return (record_struct.unpack_from(data, i * record_struct.size) for i in range(count))
+
+def decode_elements(typedef, data, count=None):
+    """
+    Decodes an array of packed fixed size elements to a list. Integers and
+    records of integers are unpacked in one pass.
+    """
+    byte_size = typedef.byte_size
+    if count is None:
+        count = len(data) // byte_size
+
+    if isinstance(typedef, TypeDefInt):
+        return list(unpack(typedef.pack_format(count), data[:count * byte_size]))
+
+    if isinstance(typedef, TypeDefRecord):
+        if typedef.auid == AUID_AUID:
+            return [AUID(bytes_le=data[i:i+16]) for i in range(0, count * 16, 16)]
+        if typedef.auid == MOBID_AUID:
+            return [MobID(bytes_le=data[i:i+32]) for i in range(0, count * 32, 32)]
+
+        record_struct = typedef.compile()[0]
+        if record_struct:
+            from_values = typedef.from_values
+            return [from_values(iter(values)) for values in iter_record_values(record_struct, data, count)]
+
+    decode = typedef.decode
+    return [decode(data[i:i+byte_size]) for i in range(0, count * byte_size, byte_size)]
+
+def encode_elements(typedef, values):
+    """
+    Encodes values to packed array data, joining the encoded elements.
+    """
+    if isinstance(typedef, TypeDefInt):
+        values = list(values)
+        return pack(typedef.pack_format(len(values)), *values)
+
+    if isinstance(typedef, TypeDefRecord) and typedef.auid not in (AUID_AUID, MOBID_AUID):
+        record_struct = typedef.compile()[0]
+        if record_struct:
+            to_values = typedef.to_values
+            record_pack = record_struct.pack
+            return b"".join([record_pack(*to_values(item, [])) for item in values])
+
+    encode = typedef.encode
+    return bytes(bytearray().join([encode(item) for item in values]))
+
 PID_FIXED_TYPE  = 0x0017
 PID_FIXED_COUNT = 0x0018
 
@@ -333,34 +430,21 @@ class TypeDefFixedArray(TypeDef):
             fmt = element_typedef.pack_format(elements)
             return unpack(fmt, data)
 
-        start = 0
-        byte_size = element_typedef.byte_size
-        result = []
-        for i in range(self.size):
-            end = start + byte_size
-            result.append(element_typedef.decode(data[start:end]))
-            start = end
-
-        return result
+        return decode_elements(element_typedef, data, self.size)
 
     def encode(self, data):
         element_typedef = self.element_typedef
-        byte_size = element_typedef.byte_size
         element_count = self.size
-        result = b""
+        data = list(data)
+
+        if len(data) > element_count:
+            raise AAFPropertyError("too many elements for fixed array: expected %d elements" % element_count)
 
-        for i, item in enumerate(data):
-            if i >= element_count:
-                raise AAFPropertyError("too many elements for fixed array: expected %d elements" % element_count)
-                break
-            result += element_typedef.encode(item)
+        result = encode_elements(element_typedef, data)
 
         # zero out remaining bytes
-        if i < element_count:
-            bytes_left = (element_count - i) * byte_size
-            while bytes_left:
-                result += b'\0'
-                bytes_left -= 1
+        if len(data) < element_count:
+            result += b'\0' * ((element_count - len(data)) * element_typedef.byte_size)
 
         return result
 
@@ -404,22 +488,22 @@ class TypeDefVarArray(TypeDef):
         if element_typedef.auid == AUID("01100100-0000-0000-060e-2b3401040101"):
             return list(iter_utf16_array(data))
 
+        return decode_elements(element_typedef, data)
 
+    def decode_array(self, data):
+        """
+        Opt in fast path for large arrays. Integer elements are returned as an
+        array.array, other fixed size elements as a memoryview of the packed
+        element data, element i is view[i*byte_size:(i+1)*byte_size].
+        """
+        element_typedef = self.element_typedef
         if isinstance(element_typedef, TypeDefInt):
-            size = element_typedef.size
-            elements = len(data)//size
-            fmt = element_typedef.pack_format(elements)
-            return list(unpack(fmt, data))
+            result = int_array(element_typedef, data)
+            if result is not None:
+                return result
+            return self.decode(data)
 
-        byte_size = element_typedef.byte_size
-        elements = len(data)//byte_size
-        start = 0
-        result = []
-        for i in range(elements):
-            end = start + byte_size
-            result.append(element_typedef.decode(data[start:end]))
-            start = end
-        return result
+        return memoryview(data)
 
     def encode(self, value):
 
@@ -428,18 +512,15 @@ class TypeDefVarArray(TypeDef):
         if element_typedef.type_name == "Character":
             return encode_utf16_array(value)
 
-        if isinstance(element_typedef, TypeDefInt):
-
-            elements = len(value)
-            fmt = element_typedef.pack_format(elements)
-            return pack(fmt, *value)
+        if isinstance(value, array.array) and isinstance(element_typedef, TypeDefInt):
+            result = int_array(element_typedef, b'')
+            if result is not None and result.typecode == value.typecode:
+                if sys.byteorder == 'big':
+                    value = array.array(value.typecode, value)
+                    value.byteswap()
+                return value.tobytes() if hasattr(value, 'tobytes') else value.tostring()
 
-        result = b''
-
-        for item in value:
-            result += element_typedef.encode(item)
-
-        return result
+        return encode_elements(element_typedef, value)
 
 PID_SET_TYPE = 0x001A
 
@@ -476,29 +557,10 @@ class TypeDefSet(TypeDef):
             raise AAFPropertyError("unkown store format: 0x%x" % self.element_typedef.store_format)
 
     def decode(self, data):
-
-        typedef = self.element_typedef
-        byte_size = typedef.byte_size
-        count = len(data) // byte_size
-        start = 0
-        result = set()
-        for i in range(count):
-            end = start + byte_size
-            v = typedef.decode(data[start:end])
-            result.add(v)
-            start = end
-
-        return result
+        return set(decode_elements(self.element_typedef, data))
 
     def encode(self, data):
-        typedef = self.element_typedef
-
-        set_data = set(data)
-        result = b""
-        for item in set_data:
-            result += typedef.encode(item)
-
-        return result
+        return encode_elements(self.element_typedef, set(data))
 
 PID_STR_TYPE = 0x001B
 
@@ -545,7 +607,7 @@ RATIONAL_AUID   = AUID("03010100-0000-0000-060e-2b3401040101")
 @register_class
 class TypeDefRecord(TypeDef):
     class_id = AUID("0d010101-020d-0000-060e-2b3402060101")
-    __slots__ = ('_fields')
+    __slots__ = ('_fields', '_compiled')
 
     def __new__(cls, root=None, name=None, type_auid=None, fields=None):
         self = super(TypeDefRecord, cls).__new__(cls, root, name, type_auid)
@@ -560,6 +622,7 @@ class TypeDefRecord(TypeDef):
             properties.add_typedef_weakref_vector_property(self, PID_RECORD_TYPES, 'MemberTypes', types)
 
         self._fields = None
+        self._compiled = None
         return self
 
     @property
@@ -584,28 +647,77 @@ class TypeDefRecord(TypeDef):
 
         return size
 
-    def decode(self, data):
-
-        # MobID
-        if self.auid == MOBID_AUID:
-            mobid = MobID(bytes_le=data)
-            return mobid
-
-        # AUID
-        if self.auid == AUID_AUID:
-            return AUID(bytes_le=data)
+    @property
+    def int_format(self):
+        """
+        struct format of the record if all members are integers, integer
+        backed enums or such records, otherwise None.
+        """
+        if self.auid in (MOBID_AUID, AUID_AUID):
+            return None
 
+        fmt = ""
+        for key, typedef, start, end in self.compile()[1]:
+            if isinstance(typedef, TypeDefEnum):
+                typedef = typedef.element_typedef
+            if isinstance(typedef, TypeDefInt):
+                fmt += typedef.format_char
+            elif isinstance(typedef, TypeDefRecord):
+                record_fmt = typedef.int_format
+                if not record_fmt:
+                    return None
+                fmt += record_fmt
+            else:
+                return None
+        return fmt
+
+    def compile(self):
+        """
+        Returns (Struct or None, members). Records of integers are packed with a
+        single Struct, others decode each member at its cached byte offset.
+        members is a list of (key, typedef, start, end).
+        """
+        if self._compiled is not None:
+            return self._compiled
+
+        members = []
         start = 0
-        result = {}
-
         for key, typedef_name in self.fields:
             typedef = self.root.metadict.lookup_typedef(typedef_name)
-
             end = start + typedef.byte_size
-            result[key] = typedef.decode(data[start:end])
+            members.append((key, typedef, start, end))
             start = end
 
+        # int_format needs the members
+        self._compiled = (None, members)
+        fmt = self.int_format
+        if fmt:
+            self._compiled = (Struct(str('<' + fmt)), members)
+        return self._compiled
+
+    def from_values(self, values):
+        result = {}
+        for key, typedef, start, end in self.compile()[1]:
+            if isinstance(typedef, TypeDefRecord):
+                result[key] = typedef.from_values(values)
+            elif isinstance(typedef, TypeDefEnum):
+                result[key] = typedef.from_value(next(values))
+            else:
+                result[key] = next(values)
+        return self.from_fields(result)
+
+    def to_values(self, data, values):
+        data = self.to_fields(data)
+        for key, typedef, start, end in self.compile()[1]:
+            if isinstance(typedef, TypeDefRecord):
+                typedef.to_values(data[key], values)
+            elif isinstance(typedef, TypeDefEnum):
+                values.append(typedef.to_value(data[key]))
+            else:
+                values.append(data[key])
+        return values
 
+    def from_fields(self, result):
         # TimeStruct
         if self.auid == TIMESTRUCT_AUID:
             t = datetime.time(result['hour'],
@@ -631,58 +743,70 @@ class TypeDefRecord(TypeDef):
 
         return result
 
-    def encode(self, data):
-        # MobID
-        if self.auid == MOBID_AUID:
-            return data.bytes_le
-
-        # AUID
-        if self.auid == AUID_AUID:
-            return data.bytes_le
-
-        result = b""
+    def to_fields(self, data):
         # TimeStamp
         if self.auid == TIMESTAMP_AUID:
             assert isinstance(data, datetime.datetime)
-            f = [self.root.metadict.lookup_typedef(t) for k, t in self.fields]
-            #date
-            result += f[0].encode(data.date())
-
-            #time
-            result += f[1].encode(data.time())
-            return result
-
+            return {'date': data.date(), 'time': data.time()}
 
         # DateStruct
         if self.auid == DATESTRUCT_AUID:
             assert isinstance(data, datetime.date)
-            d = {'year' : data.year,
-                 'month' : data.month,
-                 'day': data.day}
-            # print (d)
-            data = d
+            return {'year' : data.year,
+                    'month' : data.month,
+                    'day': data.day}
 
         # TimeStruct
         if self.auid == TIMESTRUCT_AUID:
             assert isinstance(data, datetime.time)
-            t = {'hour' : data.hour,
-                 'minute' : data.minute,
-                 'second' : data.second,
-                 'fraction' : 0 }
-            # print(t)
-            data = t
+            return {'hour' : data.hour,
+                    'minute' : data.minute,
+                    'second' : data.second,
+                    'fraction' : 0 }
 
         # Rational
         if self.auid == RATIONAL_AUID:
             r = AAFRational(data)
-            data = {'Numerator': r.numerator, 'Denominator':r.denominator }
+            return {'Numerator': r.numerator, 'Denominator':r.denominator }
 
-        for key, typedef_name in self.fields:
-            typedef = self.root.metadict.lookup_typedef(typedef_name)
-            value = typedef.encode(data[key])
-            result+=value
+        return data
 
-        return result
+    def decode(self, data):
+
+        # MobID
+        if self.auid == MOBID_AUID:
+            mobid = MobID(bytes_le=data)
+            return mobid
+
+        # AUID
+        if self.auid == AUID_AUID:
+            return AUID(bytes_le=data)
+
+        record_struct, members = self.compile()
+        if record_struct:
+            return self.from_values(iter(record_struct.unpack_from(data)))
+
+        result = {}
+        for key, typedef, start, end in members:
+            result[key] = typedef.decode(data[start:end])
+
+        return self.from_fields(result)
+
+    def encode(self, data):
+        # MobID
+        if self.auid == MOBID_AUID:
+            return data.bytes_le
+
+        # AUID
+        if self.auid == AUID_AUID:
+            return data.bytes_le
+
+        record_struct, members = self.compile()
+        if record_struct:
+            return record_struct.pack(*self.to_values(data, []))
+
+        data = self.to_fields(data)
+        return b"".join([typedef.encode(data[key]) for key, typedef, start, end in members])
 
 PID_RENAME_TYPE = 0x001E
 
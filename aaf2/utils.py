@@ -86,6 +86,10 @@ def encode_utf16le(data):
 def encode_u16le(value):
     return pack(b"<H", value)
 
+def decode_u16le(data):
+    (result, ) = unpack(b"<H", data)
+    return result
+
 def encode_u32le(value):
     return pack(b"<I", value)
 
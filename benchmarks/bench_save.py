@@ -0,0 +1,72 @@
+"""
+Measures AAFFile.save(flush=True) latency on a large file opened 'rb+', as an
+autosaving editor would do it. Each save renames one mob.
+
+    python benchmarks/bench_save.py /tmp/bench_save.aaf --size 1024
+
+Incremental saves only rewrite the fat sectors that changed. Full saves
+clear the table snapshot first, which rewrites every fat, minifat and difat
+sector the way save did before.
+"""
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import aaf2
+
+CHUNK_SIZE = 16 * 1024 * 1024
+
+def build(path, size_mb, mob_count):
+    with aaf2.open(path, 'w') as f:
+        for i in range(mob_count):
+            f.content.mobs.append(f.create.MasterMob("mob %d" % i))
+
+        s = f.cfb.open("/bench data", 'w')
+        chunk = os.urandom(1024) * (CHUNK_SIZE // 1024)
+        left = size_mb * 1024 * 1024
+        while left > 0:
+            s.write(chunk[:left])
+            left -= CHUNK_SIZE
+
+def bench(path, saves, full):
+    times = []
+    with aaf2.open(path, 'rb+') as f:
+        mobs = list(f.content.mobs)
+        for i in range(saves):
+            mobs[i % len(mobs)].name = "renamed %d" % i
+            if full:
+                f.cfb.table_sectors = {}
+            start = time.time()
+            f.save(flush=True)
+            times.append(time.time() - start)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path', help="file to create")
+    parser.add_argument('--size', type=int, default=256, help="essence size in MB")
+    parser.add_argument('--mobs', type=int, default=1000)
+    parser.add_argument('--saves', type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.time()
+    build(args.path, args.size, args.mobs)
+    print("built %s %d bytes in %.2fs" % (args.path, os.path.getsize(args.path), time.time() - start))
+
+    for name, full in (('full', True), ('incremental', False)):
+        times = bench(args.path, args.saves, full)
+        print("%-12s mean %.2fms max %.2fms" % (name,
+                                                1000 * sum(times) / len(times),
+                                                1000 * max(times)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compares two benchmarks/run.py results and flags regressions.
+
+    python benchmarks/compare.py before.json after.json --threshold 0.1
+
+Exits with status 1 if any benchmark got slower by more than threshold.
+"""
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+import sys
+import json
+import argparse
+
+def compare(base, new, threshold):
+    regressions = []
+    rows = []
+    for name in sorted(set(base) | set(new)):
+        if name not in base or name not in new:
+            rows.append((name, base.get(name, {}).get('seconds'), new.get(name, {}).get('seconds'), None, 'missing'))
+            continue
+
+        a = base[name]['seconds']
+        b = new[name]['seconds']
+        ratio = b / a if a else 1.0
+        if ratio > 1.0 + threshold:
+            status = 'REGRESSION'
+            regressions.append(name)
+        elif ratio < 1.0 - threshold:
+            status = 'faster'
+        else:
+            status = ''
+        rows.append((name, a, b, ratio, status))
+    return rows, regressions
+
+def format_ms(seconds):
+    if seconds is None:
+        return '-'
+    return "%.2fms" % (seconds * 1000)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('base', help="baseline results json")
+    parser.add_argument('new', help="new results json")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="allowed slowdown as a fraction, default %(default)s")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print("base: %s" % base['meta'].get('commit'))
+    print("new:  %s" % new['meta'].get('commit'))
+
+    rows, regressions = compare(base['results'], new['results'], args.threshold)
+    for name, a, b, ratio, status in rows:
+        ratio = '-' if ratio is None else "%.2fx" % ratio
+        print("%-28s %12s %12s %8s %s" % (name, format_ms(a), format_ms(b), ratio, status))
+
+    if regressions:
+        print("%d regression(s) over %d%%" % (len(regressions), args.threshold * 100))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Runs the pyaaf2 benchmarks and writes the results as JSON.
+
+    python benchmarks/run.py -o before.json
+    python benchmarks/run.py -o after.json --mobs 0,1000,100000
+    python benchmarks/compare.py before.json after.json
+
+Everything runs offline on synthetic files created with aaf2.open(..., 'w')
+in a temporary directory. Every result has a "seconds" value, lower is better.
+"""
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+import os
+import sys
+import json
+import time
+import wave
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import aaf2
+from aaf2 import properties
+
+import bench_save
+
+def best_of(repeat, func, *args):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        func(*args)
+        t = time.time() - start
+        if best is None or t < best:
+            best = t
+    return best
+
+def build_mobs(path, mob_count):
+    with aaf2.open(path, 'w') as f:
+        for i in range(mob_count):
+            mob = f.create.MasterMob("mob %d" % i)
+            slot = mob.create_empty_sequence_slot(25, media_kind='picture')
+            slot.segment.components.append(f.create.Filler('picture', 100))
+            f.content.mobs.append(mob)
+
+def open_file(path):
+    with aaf2.open(path, 'r') as f:
+        pass
+
+def read_mob_names(path):
+    with aaf2.open(path, 'r') as f:
+        for mob in f.content.mobs:
+            mob.name
+
+def walk_file(path):
+    with aaf2.open(path, 'r') as f:
+        for item, streams in f.root.walk_references():
+            for p in item.properties():
+                if not isinstance(p, (properties.StrongRefProperty,
+                                      properties.StrongRefVectorProperty,
+                                      properties.StrongRefSetProperty)):
+                    p.value
+
+def bench_import(python):
+    script = "import time; start = time.time(); import aaf2; print(time.time() - start)"
+    best = None
+    for i in range(5):
+        out = subprocess.check_output([python, '-c', script], cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+        t = float(out.decode('ascii').strip())
+        if best is None or t < best:
+            best = t
+    return {'import aaf2': {'seconds': best}}
+
+def bench_mobs(work_dir, mob_count, repeat, saves):
+    results = {}
+    path = os.path.join(work_dir, 'mobs_%d.aaf' % mob_count)
+
+    start = time.time()
+    build_mobs(path, mob_count)
+    results['write %d mobs' % mob_count] = {'seconds': time.time() - start}
+
+    results['open %d mobs' % mob_count] = {'seconds': best_of(repeat, open_file, path)}
+    results['read %d mob names' % mob_count] = {'seconds': best_of(repeat, read_mob_names, path)}
+    results['walk %d mobs' % mob_count] = {'seconds': best_of(repeat, walk_file, path)}
+
+    if mob_count:
+        times = bench_save.bench(path, saves, False)
+        results['save %d mobs' % mob_count] = {'seconds': sum(times) / len(times),
+                                               'max_seconds': max(times)}
+    return results
+
+def write_wav(path, size_mb):
+    sample_rate = 48000
+    channels = 2
+    sample_width = 3
+    w = wave.open(path, 'wb')
+    try:
+        w.setnchannels(channels)
+        w.setframerate(sample_rate)
+        w.setsampwidth(sample_width)
+        second = os.urandom(sample_rate * channels * sample_width)
+        for i in range(max(1, size_mb * 1024 * 1024 // len(second))):
+            w.writeframesraw(second)
+    finally:
+        w.close()
+
+def bench_essence(work_dir, size_mb):
+    wav_path = os.path.join(work_dir, 'essence.wav')
+    aaf_path = os.path.join(work_dir, 'essence.aaf')
+    export_path = os.path.join(work_dir, 'export.wav')
+    write_wav(wav_path, size_mb)
+    size = os.path.getsize(wav_path)
+
+    start = time.time()
+    with aaf2.open(aaf_path, 'w') as f:
+        mob = f.create.MasterMob("essence")
+        f.content.mobs.append(mob)
+        mob.import_audio_essence(wav_path)
+    import_time = time.time() - start
+
+    start = time.time()
+    with aaf2.open(aaf_path, 'r') as f:
+        for mob in f.content.sourcemobs():
+            if mob.essence:
+                mob.export_audio(export_path)
+    export_time = time.time() - start
+
+    mb = size / (1024 * 1024)
+    return {'import audio essence': {'seconds': import_time, 'mb_per_second': mb / import_time},
+            'export audio essence': {'seconds': export_time, 'mb_per_second': mb / export_time}}
+
+def git_commit():
+    try:
+        out = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                      cwd=os.path.dirname(os.path.abspath(__file__)),
+                                      stderr=subprocess.STDOUT)
+        return out.decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-o', '--output', help="write json results to file instead of stdout")
+    parser.add_argument('--mobs', default="0,1000", help="comma separated mob counts, default %(default)s")
+    parser.add_argument('--essence-size', type=int, default=32, help="wav size in MB, default %(default)s")
+    parser.add_argument('--repeat', type=int, default=3, help="best of repeat runs, default %(default)s")
+    parser.add_argument('--saves', type=int, default=20, help="saves to average, default %(default)s")
+    args = parser.parse_args()
+
+    mob_counts = [int(v) for v in args.mobs.split(',') if v.strip()]
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix='aaf2_bench_')
+    try:
+        results.update(bench_import(sys.executable))
+        for mob_count in mob_counts:
+            results.update(bench_mobs(work_dir, mob_count, args.repeat, args.saves))
+        results.update(bench_essence(work_dir, args.essence_size))
+    finally:
+        shutil.rmtree(work_dir)
+
+    for name in sorted(results):
+        print("%-28s %10.2fms" % (name, results[name]['seconds'] * 1000), file=sys.stderr)
+
+    data = {'meta': {'commit': git_commit(),
+                     'python': platform.python_version(),
+                     'platform': platform.platform(),
+                     'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                     'args': vars(args)},
+            'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(data, indent=2, sort_keys=True))
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,11 @@ import unittest
 import aaf2
 from aaf2.file import AAFFile
 from aaf2 import properties
+from aaf2.cfb import iter_extents
 
 import common
 import shutil
+import threading
 
 class AAFTests(unittest.TestCase):
 
@@ -22,6 +24,351 @@ class AAFTests(unittest.TestCase):
         with AAFFile(test_file) as f:
             common.walk_aaf(f.root)
 
+    def test_mmap(self):
+        test_file = common.test_file_01()
+        with aaf2.open(test_file, 'r') as a:
+            with aaf2.open(test_file, 'r', mmap=True) as b:
+                for root, storage, streams in a.cfb.walk():
+                    for item in streams:
+                        s_a = a.cfb.open(item.path(), 'r')
+                        s_b = b.cfb.open(item.path(), 'r')
+                        assert s_a.read() == s_b.read()
+
+                # mapped reads are counted too, there is no sector cache to hit
+                assert b.cfb.stats()['bytes_read'] >= a.cfb.stats()['bytes_read'] > 0
+
+                common.walk_aaf(b.root)
+                assert len(list(a.content.mobs)) == len(list(b.content.mobs))
+
+        with self.assertRaises(ValueError):
+            aaf2.open(mode='w', mmap=True)
+
+    def test_threadsafe(self):
+        test_file = common.test_file_01()
+
+        expected = {}
+        with aaf2.open(test_file, 'r') as f:
+            for root, storage, streams in f.cfb.walk():
+                for item in streams:
+                    expected[item.path()] = bytes(item.open('r').read())
+            mob_names = sorted(str(mob.name) for mob in f.content.mobs)
+
+        paths = sorted(expected)
+        errors = []
+
+        with aaf2.open(test_file, 'r', threadsafe=True) as f:
+            def read_streams(offset):
+                try:
+                    for i in range(len(paths)):
+                        path = paths[(i + offset) % len(paths)]
+                        s = f.cfb.open(path, 'r')
+                        data = bytearray()
+                        for chunk in s.iter_chunks(100):
+                            data.extend(chunk)
+                        if data != expected[path]:
+                            errors.append(path)
+                    names = sorted(str(mob.name) for mob in f.content.mobs)
+                    if names != mob_names:
+                        errors.append("mob names")
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=read_streams, args=(i * 7,)) for i in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        assert not errors, errors
+
+        with self.assertRaises(ValueError):
+            aaf2.open(mode='w', threadsafe=True)
+
+    def test_cache_stats(self):
+        test_file = common.test_file_01()
+        with aaf2.open(test_file, 'r', sector_cache_size=4, object_cache_size=8) as f:
+            common.walk_aaf(f.root)
+            stats = f.cache_stats()
+
+            assert stats['sector_cache']['size'] == 4
+            assert stats['object_cache']['size'] == 8
+            assert stats['sector_cache']['count'] <= 4
+            assert stats['object_cache']['count'] <= 8
+            for name in ('sector_cache', 'object_cache'):
+                assert stats[name]['misses'] > 0
+                assert stats[name]['evictions'] > 0
+            assert stats['children_cache']['hits'] > 0
+            assert stats['bytes_read'] >= stats['sector_cache']['misses'] * f.cfb.sector_size
+
+            f.reset_cache_stats()
+            stats = f.cache_stats()
+            assert stats['bytes_read'] == 0
+            for name in ('sector_cache', 'children_cache', 'object_cache'):
+                assert stats[name]['hits'] == stats[name]['misses'] == stats[name]['evictions'] == 0
+
+    def test_lazy_index(self):
+        test_file = common.test_file_01()
+        with aaf2.open(test_file, 'r') as f:
+            expected = {}
+            for mob in f.content.mobs:
+                expected[mob.mob_id] = (mob.name, [slot.slot_id for slot in mob.slots])
+
+        # the slot descriptor skips __getattr__, so it shows if the index was read
+        references = properties.StrongRefVectorProperty.references
+
+        with aaf2.open(test_file, 'r', lazy_index=True) as f:
+            mobs = list(f.content.mobs)
+            assert sorted(mob.mob_id for mob in mobs) == sorted(expected)
+            for mob in mobs:
+                assert mob.name == expected[mob.mob_id][0]
+                p = mob.get('Slots', allkeys=False)
+                with self.assertRaises(AttributeError):
+                    references.__get__(p, type(p))
+
+            for mob in mobs:
+                assert [slot.slot_id for slot in mob.slots] == expected[mob.mob_id][1]
+                p = mob.get('Slots', allkeys=False)
+                assert len(references.__get__(p, type(p))) == len(expected[mob.mob_id][1])
+
+            common.walk_aaf(f.root)
+
+    def test_save_modified_properties(self):
+        new_file = os.path.join(common.sandbox(), 'save_modified_properties.aaf')
+        shutil.copy(common.test_file_01(), new_file)
+
+        index_classes = (properties.StrongRefVectorProperty,
+                         properties.StrongRefSetProperty,
+                         properties.WeakRefArrayProperty)
+        written = []
+        def spy(write_index):
+            def func(self):
+                written.append(self)
+                return write_index(self)
+            return func
+
+        originals = [cls.__dict__['write_index'] for cls in index_classes]
+        try:
+            for cls, write_index in zip(index_classes, originals):
+                cls.write_index = spy(write_index)
+
+            with aaf2.open(new_file, 'r+') as f:
+                # flush metadict changes made on open
+                f.save()
+                del written[:]
+
+                mobs = list(f.content.mobs)
+                names = {}
+                for mob in mobs:
+                    mob.name = "renamed %s" % mob.name
+                    names[mob.mob_id] = mob.name
+                    assert f.manager.modified_pids[mob.dir.path()] == set([mob['Name'].pid])
+
+                f.save()
+                assert not written
+                assert not f.manager.modified
+
+                mob = mobs[0]
+                mob.slots[0].name = "renamed slot"
+                f.content.mobs.append(f.create.MasterMob("new mob"))
+                f.save()
+                assert f.content['Mobs'] in written
+                assert mob['Slots'] not in written
+        finally:
+            for cls, write_index in zip(index_classes, originals):
+                cls.write_index = write_index
+
+        with aaf2.open(new_file, 'r') as f:
+            common.walk_aaf(f.root)
+            for mob_id, name in names.items():
+                assert f.content.mobs.get(mob_id).name == name
+            assert f.content.mobs.get(mob.mob_id).slots[0].name == "renamed slot"
+            assert len(list(f.content.mobs)) == len(names) + 1
+
+    def test_incremental_save(self):
+        new_file = os.path.join(common.sandbox(), 'incremental_save.aaf')
+        shutil.copy(common.test_file_01(), new_file)
+
+        with aaf2.open(new_file, 'r+') as f:
+            f.save(flush=True)
+            table_sids = set(f.cfb.table_sectors)
+            assert table_sids
+
+            written = []
+            write_sector_data = f.cfb.write_sector_data
+            def spy(sid, sid_offset, data):
+                written.append(sid)
+                return write_sector_data(sid, sid_offset, data)
+            f.cfb.write_sector_data = spy
+
+            f.save(flush=True)
+            assert not table_sids.intersection(written)
+
+            mob = next(f.content.mobs.values())
+            mob.name = "incremental save"
+            mob_id = mob.mob_id
+            f.content.mobs.append(f.create.MasterMob("incremental mob"))
+
+            # tables are only written when asked for
+            f.save()
+            assert not table_sids.intersection(written)
+
+            f.save(flush=True)
+            assert len(table_sids.intersection(written)) < len(table_sids)
+
+            # saved changes are readable while the file is still open
+            with aaf2.open(new_file, 'r') as f2:
+                assert f2.content.mobs.get(mob_id).name == "incremental save"
+                assert "incremental mob" in [m.name for m in f2.content.mobs]
+                common.walk_aaf(f2.root)
+
+            # keep writing after the flush
+            for i in range(100):
+                f.content.mobs.append(f.create.MasterMob("after flush %d" % i))
+            f.save(flush=True)
+            for i in range(100, 200):
+                f.content.mobs.append(f.create.MasterMob("after flush %d" % i))
+
+        with aaf2.open(new_file, 'r') as f:
+            common.walk_aaf(f.root)
+            names = set(m.name for m in f.content.mobs)
+            for i in range(200):
+                assert "after flush %d" % i in names
+
+    def test_weakref_index(self):
+        new_file = os.path.join(common.sandbox(), 'weakref_index.aaf')
+        with aaf2.open(new_file, 'w') as f:
+            index = f.weakref_index([0x0001, 0x0002, 0x0003])
+            assert f.weakref_index([0x0001, 0x0002, 0x0003]) == index
+            assert f.weakref_index([0x0001, 0x0002]) == index + 1
+            assert f.weakref_table[index] == [0x0001, 0x0002, 0x0003]
+
+        with aaf2.open(new_file, 'r') as f:
+            for i, path in enumerate(f.weakref_table):
+                assert f.weakref_index(list(path)) == f.weakref_table.index(path)
+            assert f.weakref_index([0x0001, 0x0002]) == index + 1
+
+    def test_mob_index(self):
+        test_file = common.test_file_01()
+        with aaf2.open(test_file, 'r') as f:
+            expected = {}
+            for name, mob_class in (('mastermobs', aaf2.mobs.MasterMob),
+                                    ('compositionmobs', aaf2.mobs.CompositionMob),
+                                    ('sourcemobs', aaf2.mobs.SourceMob)):
+                expected[name] = sorted(mob.mob_id for mob in f.content.mobs if isinstance(mob, mob_class))
+            expected['toplevel'] = sorted(mob.mob_id for mob in f.content.mobs
+                                          if isinstance(mob, aaf2.mobs.CompositionMob) and mob.usage == 'Usage_TopLevel')
+            assert expected['toplevel']
+
+        with aaf2.open(test_file, 'r') as f:
+            # only composition mobs are read to check their usage
+            f.reset_cache_stats()
+            assert sorted(mob.mob_id for mob in f.content.toplevel()) == expected['toplevel']
+            assert f.cache_stats()['object_cache']['misses'] < len(expected['mastermobs']) + len(expected['sourcemobs'])
+
+            for name in expected:
+                assert sorted(mob.mob_id for mob in getattr(f.content, name)()) == expected[name]
+
+        with aaf2.open() as f:
+            mob = f.create.CompositionMob("top")
+            f.content.mobs.append(mob)
+            assert list(f.content.toplevel()) == []
+            mob.usage = 'Usage_TopLevel'
+            assert list(f.content.toplevel()) == [mob]
+            master = f.create.MasterMob("master")
+            f.content.mobs.append(master)
+            assert [m.name for m in f.content.mastermobs()] == ["master"]
+
+            # writes that aren't to Mobs or a UsageCode keep the index
+            assert list(f.content.toplevel()) == [mob]
+            index = f.content.mob_index()
+            cache = f.content._mob_index[1]
+            master.name = "renamed"
+            mob.create_picture_slot()
+            master.usage = 'Usage_TopLevel'
+            assert f.content.mob_index() is index
+            assert list(f.content.toplevel()) == [mob]
+            assert f.content._mob_index[1] is cache
+
+            mob.usage = 'Usage_SubClip'
+            assert list(f.content.toplevel()) == []
+            f.content.mobs.pop(master.mob_id)
+            assert f.content.mob_index() is not index
+
+    def test_references_to(self):
+        test_file = common.test_file_01()
+        with aaf2.open(test_file, 'r') as f:
+            expected = {}
+            for mob in f.content.mobs:
+                for slot in mob.slots:
+                    for item, streams in slot.walk_references():
+                        if isinstance(item, aaf2.components.SourceReference) and item.mob:
+                            expected.setdefault(item.mob_id, []).append(item.dir.path())
+            assert expected
+
+            for mob in f.content.mobs:
+                refs = f.content.references_to(mob)
+                assert sorted(c.dir.path() for m, slot, c in refs) == sorted(expected.get(mob.mob_id, []))
+                for m, slot, c in refs:
+                    assert c.mob_id == mob.mob_id
+                    assert slot in m.slots
+
+        with aaf2.open() as f:
+            master = f.create.MasterMob("master")
+            f.content.mobs.append(master)
+            master_slot = master.create_picture_slot()
+            master_slot.segment.length = 100
+
+            comp = f.create.CompositionMob("comp")
+            f.content.mobs.append(comp)
+            assert f.content.references_to(master) == []
+
+            index = f.content.reference_index()
+
+            # unattached clips aren't indexed
+            clip = master.create_source_clip(master_slot.slot_id)
+            assert f.content.references_to(master) == []
+
+            slot = comp.create_picture_slot()
+            slot.segment.components.append(clip)
+            assert f.content.references_to(master.mob_id) == [(comp, slot, clip)]
+
+            # the index is updated in place, unrelated writes keep it
+            comp.name = "renamed"
+            master_slot.segment.length = 200
+            assert f.content.reference_index() is index
+            assert all(isinstance(path, type(clip.dir.path())) for path in index.mob_ids)
+
+            # changing SourceID moves the reference
+            other = f.create.MasterMob("other")
+            f.content.mobs.append(other)
+            other_slot = other.create_picture_slot()
+            clip.mob_id = other.mob_id
+            assert f.content.references_to(master) == []
+            assert f.content.references_to(other) == [(comp, slot, clip)]
+            clip.mob = master
+
+            # attaching a whole mob indexes its clips
+            comp2 = f.create.CompositionMob("comp2")
+            slot2 = comp2.create_picture_slot()
+            clip2 = master.create_source_clip(master_slot.slot_id)
+            slot2.segment.components.append(clip2)
+            f.content.mobs.append(comp2)
+            assert len(f.content.references_to(master)) == 2
+
+            # matches a full rebuild
+            paths = dict((mob_id, set(p)) for mob_id, p in index.paths.items())
+            f.reference_index = None
+            rebuilt = f.content.reference_index()
+            assert rebuilt is not index
+            assert rebuilt.paths == paths
+
+            f.content.mobs.pop(comp2.mob_id)
+            assert f.content.references_to(master) == [(comp, slot, clip)]
+
+            slot.segment.components.pop(0)
+            assert f.content.references_to(master) == []
+            assert not rebuilt.paths
+
     def test_save_as(self):
 
         new_file = os.path.join(common.sandbox(), 'save_r+.aaf')
@@ -36,6 +383,59 @@ class AAFTests(unittest.TestCase):
         with aaf2.open(new_file, 'r') as f:
             common.walk_aaf(f.root)
 
+    def test_save_as_compact(self):
+        src_file = os.path.join(common.sandbox(), 'save_as_src.aaf')
+        compact_file = os.path.join(common.sandbox(), 'save_as_compact.aaf')
+        copy_file = os.path.join(common.sandbox(), 'save_as_copy.aaf')
+        shutil.copy(common.test_file_01(), src_file)
+
+        with aaf2.open(src_file, 'r+') as f:
+            mob_ids = sorted(mob.mob_id for mob in f.content.mobs)
+            for mob_id in mob_ids[::3]:
+                f.content.mobs.pop(mob_id)
+
+            mob = f.create.MasterMob("save_as mob")
+            f.content.mobs.append(mob)
+
+            flushes = []
+            flush = f.cfb.flush
+            def spy():
+                flushes.append(True)
+                return flush()
+            f.cfb.flush = spy
+
+            # compacting doesn't need the tables on disk
+            f.save_as(compact_file)
+            assert not flushes
+            f.save_as(copy_file, compact=False)
+            assert flushes
+            mob_names = sorted(str(mob.name) for mob in f.content.mobs)
+
+        def read_streams(cfb):
+            result = {}
+            for root, storage, streams in cfb.walk():
+                for item in streams:
+                    if not item.path().startswith('/tmp/'):
+                        result[item.path()] = item.open('r').read()
+            return result
+
+        with aaf2.open(src_file, 'r') as src:
+            src_streams = read_streams(src.cfb)
+            for path in (compact_file, copy_file):
+                with aaf2.open(path, 'r') as f:
+                    assert sorted(str(mob.name) for mob in f.content.mobs) == mob_names
+                    common.walk_aaf(f.root)
+                    assert read_streams(f.cfb) == src_streams
+
+        with aaf2.open(compact_file, 'r') as f:
+            assert not f.cfb.exists('/tmp')
+            for root, storage, streams in f.cfb.walk():
+                for item in streams:
+                    if item.byte_size >= f.cfb.min_stream_max_size:
+                        fat_chain = item.open('r').fat_chain
+                        assert len(list(iter_extents(fat_chain, 0, len(fat_chain)))) == 1
+
+        assert os.path.getsize(compact_file) <= os.path.getsize(copy_file)
 
 if __name__ == "__main__":
     import logging
@@ -4,7 +4,9 @@ from __future__ import (
     print_function,
     division,
     )
-from aaf2.cfb import CompoundFileBinary
+import aaf2
+from aaf2.cfb import CompoundFileBinary, DirEntry, iter_extents
+from aaf2.cache import LRUCacheDict
 import os
 import io
 
@@ -162,6 +164,291 @@ class StreamTests(unittest.TestCase):
 
         self.write_and_ovewrite("mini_and_large_stream.aaf", data1, data2)
 
+    def test_fragmented_extents(self):
+        path = os.path.join(test_dir, "fragmented_extents.aaf")
+        data_a = bytearray(b"".join(b"stream a %08d" % i for i in range(20000)))
+        data_b = bytearray(b"".join(b"stream b %08d" % i for i in range(20000)))
+        chunksize = 4096 * 3 + 7
+
+        with io.open(path, 'wb+') as f:
+            cfb = CompoundFileBinary(f, 'wb+')
+            a = cfb.open("/stream_a", 'w')
+            b = cfb.open("/stream_b", 'w')
+
+            # interleave writes so the fat chains are fragmented
+            for i in range(0, len(data_a), chunksize):
+                a.write(data_a[i:i+chunksize])
+                b.write(data_b[i:i+chunksize])
+
+            assert len(list(iter_extents(a.fat_chain, 0, len(a.fat_chain)))) > 1
+
+            # overwrite across extent boundaries
+            a.seek(4000)
+            a.write(b"X" * 9000)
+            data_a[4000:13000] = b"X" * 9000
+            cfb.close()
+
+        for use_mmap in (False, True):
+            with io.open(path, 'rb') as f:
+                cfb = CompoundFileBinary(f, 'rb', mmap=use_mmap)
+                for name, data in (("/stream_a", data_a), ("/stream_b", data_b)):
+                    s = cfb.open(name, 'r')
+                    assert s.read() == data
+                    for pos, size in ((0, 10), (4090, 10), (4096, 8192), (5000, 20000), (len(data) - 3, 100)):
+                        s.seek(pos)
+                        assert s.read(size) == data[pos:pos+size]
+                cfb.close()
+
+    def test_free_sector_reuse(self):
+        path = os.path.join(test_dir, "free_sector_reuse.aaf")
+        data = {}
+        with io.open(path, 'wb+') as f:
+            cfb = CompoundFileBinary(f, 'wb+')
+            for i, d in enumerate(large_data(20)):
+                name = "/stream%02d" % i
+                cfb.open(name, 'w').write(d)
+                data[name] = d
+            cfb.close()
+
+        removed = sorted(data)[::2]
+        with io.open(path, 'rb+') as f:
+            cfb = CompoundFileBinary(f, 'rb+')
+            for name in removed:
+                cfb.remove(name)
+                del data[name]
+
+            # mixed sizes exercise both fat and minifat freelists
+            new_data = {"/new_large": b"new large data" * 50000,
+                        "/new_small": b"new small data" * 10}
+            for name, d in new_data.items():
+                s = cfb.open(name, 'w')
+                for i in range(0, len(d), 5000):
+                    s.write(d[i:i+5000])
+                data[name] = d
+
+            large = cfb.open("/new_large", 'r')
+            # freed holes are reused lowest first, each hole is filled contiguously
+            assert len(list(iter_extents(large.fat_chain, 0, len(large.fat_chain)))) <= len(removed) + 1
+
+            used = set()
+            for name in data:
+                chain = cfb.open(name, 'r').fat_chain
+                if cfb.find(name).byte_size >= cfb.min_stream_max_size:
+                    assert not used.intersection(chain)
+                    used.update(chain)
+            cfb.close()
+
+        with io.open(path, 'rb') as f:
+            cfb = CompoundFileBinary(f, 'rb')
+            for name, d in data.items():
+                assert cfb.open(name, 'r').read() == d
+            for name in removed:
+                assert not cfb.exists(name)
+
+    def test_write_buffer(self):
+        data = {}
+        for i, d in enumerate(small_data(200)):
+            data["/small%03d" % i] = d
+        for i, d in enumerate(large_data(5)):
+            data["/large%03d" % i] = d
+
+        for write_buffer_size in (0, 4096 * 4, 4 * 1024 * 1024):
+            path = os.path.join(test_dir, "write_buffer_%d.aaf" % write_buffer_size)
+            with io.open(path, 'wb+') as f:
+                cfb = CompoundFileBinary(f, 'wb+', write_buffer_size=write_buffer_size)
+                streams = dict((name, cfb.open(name, 'w')) for name in sorted(data))
+
+                # interleave small unaligned writes across all the streams
+                for i in range(0, max(len(d) for d in data.values()), 1000):
+                    for name, s in streams.items():
+                        s.write(data[name][i:i+1000])
+
+                assert len(cfb.dirty_sectors) * cfb.sector_size <= max(write_buffer_size, cfb.sector_size)
+
+                # buffered data is visible before close
+                for name, d in data.items():
+                    assert cfb.open(name, 'r').read() == d
+                cfb.close()
+                assert not cfb.dirty_sectors
+
+            with io.open(path, 'rb') as f:
+                cfb = CompoundFileBinary(f, 'rb')
+                for name, d in data.items():
+                    assert cfb.open(name, 'r').read() == d
+
+    def test_flush_then_write(self):
+        path = os.path.join(test_dir, "flush_then_write.aaf")
+        small = list(small_data(300))
+        large = b"large data\n" * 20000
+
+        with io.open(path, 'wb+') as f:
+            cfb = CompoundFileBinary(f, 'wb+')
+            for i in range(200):
+                cfb.open("/small%d" % i, 'w').write(small[i])
+            cfb.close()
+
+        with io.open(path, 'rb+') as f:
+            cfb = CompoundFileBinary(f, 'rb+')
+            for i in range(100, 200):
+                cfb.remove("/small%d" % i)
+
+            # shrinks the mini stream in use, but the stream keeps its sectors
+            cfb.flush()
+
+            cfb.open("/large", 'w').write(large)
+            for i in range(200, 300):
+                cfb.open("/small%d" % i, 'w').write(small[i])
+            cfb.close()
+
+        with io.open(path, 'rb') as f:
+            cfb = CompoundFileBinary(f, 'rb')
+            assert cfb.open("/large", 'r').read() == large
+            for i in list(range(100)) + list(range(200, 300)):
+                assert cfb.open("/small%d" % i, 'r').read() == small[i]
+            for i in range(100, 200):
+                assert cfb.find("/small%d" % i) is None
+
+    def test_dir_table(self):
+        test_file = common.test_file_01()
+
+        def walk_dump(cfb):
+            result = []
+            for root, storage, streams in cfb.walk():
+                result.append((root.path(),
+                               sorted((item.path(), item.class_id) for item in storage),
+                               sorted((item.path(), item.byte_size, item.sector_id) for item in streams)))
+            # listdir order is dict order, which python 2 doesn't keep
+            return sorted(result)
+
+        with io.open(test_file, 'rb') as f:
+            cfb = CompoundFileBinary(f, 'rb')
+            expected = walk_dump(cfb)
+            paths = [item[0] for item in expected]
+            paths.extend(path for item in expected for path, size, sid in item[2])
+
+        with io.open(test_file, 'rb') as f:
+            cfb = CompoundFileBinary(f, 'rb', dir_table=True, children_cache_size=4)
+            assert len(cfb.dir_table) == cfb.dir_sector_count * cfb.sector_size // 128
+
+            # find before anything is listed
+            for path in paths:
+                entry = cfb.find(path)
+                assert entry.path() == path
+                assert entry.byte_size is not None
+
+                # tree fields come from the table, raw data is read when needed
+                with self.assertRaises(AttributeError):
+                    DirEntry.data.__get__(entry)
+                entry.flags
+                assert len(DirEntry.data.__get__(entry)) == 128
+            assert len(cfb.dir_table.children_ids) <= 4
+
+            assert cfb.find("/Header-2/does_not_exist") is None
+            with self.assertRaises(ValueError):
+                cfb.find(paths[-1] + "/child")
+
+            assert walk_dump(cfb) == expected
+
+        with aaf2.open(test_file, 'r', dir_table=True) as f:
+            common.walk_aaf(f.root)
+
+        with self.assertRaises(ValueError):
+            CompoundFileBinary(io.BytesIO(), 'wb+', dir_table=True)
+
+    def test_path_index(self):
+        path = os.path.join(test_dir, "path_index.aaf")
+        with io.open(path, 'wb+') as f:
+            cfb = CompoundFileBinary(f, 'wb+', children_cache_size=2)
+            cfb.makedirs("/a/b/c")
+            cfb.makedirs("/d")
+            cfb.open("/a/b/c/stream", 'w').write(b"data")
+
+            entry = cfb.find("/a/b/c/stream")
+            assert cfb.path_index["/a/b/c/stream"] == entry.dir_id
+            assert cfb.find("/a/b/c/stream") is entry
+
+            # non normalized paths resolve but are not indexed
+            assert cfb.find("a/b/c/stream") is entry
+            assert "a/b/c/stream" not in cfb.path_index
+            assert cfb.find("/a/b/missing") is None
+
+            cfb.remove("/a/b/c/stream")
+            assert cfb.find("/a/b/c/stream") is None
+            cfb.open("/a/b/c/stream", 'w').write(b"new data")
+            assert cfb.find("/a/b/c/stream").open('r').read() == b"new data"
+
+            c = cfb.find("/a/b/c")
+            cfb.move("/a/b", "/d/b")
+            assert cfb.find("/a/b") is None
+            assert cfb.find("/a/b/c") is None
+            assert cfb.find("/d/b/c") is c
+            assert cfb.find("/d/b/c/stream").open('r').read() == b"new data"
+
+            cfb.rmtree("/d/b")
+            assert cfb.find("/d/b/c/stream") is None
+            assert cfb.find("/d/b/c") is None
+            assert cfb.find("/d") is not None
+            cfb.close()
+
+        # released entries are read again by dir_id instead of searching the tree
+        test_file = common.test_file_01()
+        with io.open(test_file, 'rb') as f:
+            cfb = CompoundFileBinary(f, 'rb')
+            paths = []
+            for root, storage, streams in cfb.walk():
+                paths.extend(item.path() for item in storage)
+                paths.extend(item.path() for item in streams)
+            for path in paths:
+                cfb.find(path)
+            del root, storage, streams
+            # release every DirEntry
+            cfb.children_cache = LRUCacheDict(2)
+            assert len(cfb.dir_cache) < len(paths)
+
+            searched = []
+            find_split_path = cfb.find_split_path
+            def spy(split_path):
+                searched.append(split_path)
+                return find_split_path(split_path)
+            cfb.find_split_path = spy
+
+            for path in paths:
+                entry = cfb.find(path)
+                assert entry.path() == path
+            assert not searched
+
+    def test_readinto(self):
+        path = os.path.join(test_dir, "readinto_test.aaf")
+        data_list = [b"small data\n" * 10, b"large data\n" * 5000]
+
+        with io.open(path, 'wb+') as f:
+            cfb = CompoundFileBinary(f, 'wb+')
+            for i, data in enumerate(data_list):
+                cfb.open("/stream%d" % i, 'w').write(data)
+
+            for i, data in enumerate(data_list):
+                s = cfb.open("/stream%d" % i, 'r')
+                buf = bytearray(b"?" * 100)
+                assert s.readinto(buf) == 100
+                assert buf == data[:100]
+
+                s.seek(len(data) - 10)
+                assert s.readinto(buf) == 10
+                assert buf[:10] == data[-10:]
+                assert s.readinto(buf) == 0
+
+                s.seek(0)
+                buf = bytearray(333)
+                chunks = []
+                for chunk in s.iter_chunks(333, buf):
+                    # chunks are views into buf
+                    assert chunk.tobytes() == bytes(buf[:len(chunk)])
+                    chunks.append(chunk.tobytes())
+                assert b"".join(chunks) == data
+                assert len(chunks) == (len(data) + 332) // 333
+
+            cfb.close()
+
     def test_seek(self):
         path = os.path.join(test_dir, "seek_test.aaf")
 
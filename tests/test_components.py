@@ -15,6 +15,49 @@ import datetime
 class ComponentAAFTests(unittest.TestCase):
 
 
+    def test_datadef_cache(self):
+        result_file = common.get_test_file('datadef_cache.aaf')
+
+        with aaf2.open(result_file, 'w') as f:
+            mob = f.create.CompositionMob()
+            slot = mob.create_picture_slot()
+            filler = f.create.Filler()
+            filler.media_kind = "picture"
+            filler.length = 10
+            slot.segment.components.append(filler)
+            f.content.mobs.append(mob)
+
+            datadef = filler.datadef
+            p = filler['DataDefinition']
+            resolve_weakref = aaf2.properties.resolve_weakref
+            calls = []
+            def spy(p, ref):
+                calls.append(ref)
+                return resolve_weakref(p, ref)
+
+            aaf2.properties.resolve_weakref = spy
+            try:
+                assert filler.datadef is datadef
+                assert not calls
+
+                # replacing the target in the set invalidates the cached one
+                datadefs = f.dictionary['DataDefinitions']
+                datadefs.pop(datadef.auid)
+                new_datadef = f.create.DataDef(datadef.auid, datadef.name, datadef.description)
+                datadefs.append(new_datadef)
+                assert filler.datadef is new_datadef
+                assert calls == [datadef.auid]
+                assert filler.datadef is new_datadef
+                assert len(calls) == 1
+            finally:
+                aaf2.properties.resolve_weakref = resolve_weakref
+
+        with aaf2.open(result_file, 'r') as f:
+            mob = next(f.content.mobs.values())
+            filler = mob.slots[0].segment.components[0]
+            assert filler.media_kind == "Picture"
+            assert filler.datadef is filler.datadef
+
     def test_marker(self):
         result_file = common.get_test_file('descriptive_marker.aaf')
         described_slots = set([1,2,3,4])
@@ -58,8 +101,127 @@ class ComponentAAFTests(unittest.TestCase):
             assert marker['DescribedSlots'].value == described_slots
             assert marker['Position'].value == 100
 
+    def test_slot_index(self):
+        result_file = common.get_test_file('slot_index.aaf')
+        with aaf2.open(result_file, 'w') as f:
+            mob = f.create.MasterMob("slots")
+            f.content.mobs.append(mob)
+            for i in range(5):
+                slot = mob.create_picture_slot()
+                assert slot.slot_id == i + 1
+                assert mob.slot_at(slot.slot_id) is slot
+
+            slot = mob.create_empty_sequence_slot(25, slot_id=10, media_kind='picture')
+            assert mob.slot_at(10) is slot
+            assert mob.create_picture_slot().slot_id == 11
+            with self.assertRaises(ValueError):
+                mob.create_timeline_slot(25, slot_id=3)
+
+            # changing Slots or a slot id updates the index
+            mob.slots.pop(0)
+            with self.assertRaises(IndexError):
+                mob.slot_at(1)
+            assert mob.slot_at(2).slot_id == 2
+            mob.slot_at(11).slot_id = 20
+            assert mob.slot_at(20).slot_id == 20
+            assert mob.create_picture_slot().slot_id == 21
+
+            # writes elsewhere keep the index
+            index = mob.slot_index()
+            other = f.create.MasterMob("other")
+            f.content.mobs.append(other)
+            for i in range(5):
+                other.name = "other %d" % i
+                clip = mob.create_source_clip(2)
+                assert mob.slot_index() is index
 
-
+        with aaf2.open(result_file, 'r') as f:
+            mob = next(f.content.mobs.values())
+            assert [mob.slot_at(slot.slot_id) for slot in mob.slots] == list(mob.slots)
+
+    def test_source_chains(self):
+        def resolve_chain(clip):
+            chain = []
+            try:
+                item = clip.resolve()
+                while item is not None:
+                    chain.append(item)
+                    if not isinstance(item, aaf2.components.SourceClip):
+                        break
+                    item = item.resolve()
+            except NotImplementedError:
+                chain.append(NotImplementedError)
+            return chain
+
+        def walk_chain(clip):
+            chain = []
+            try:
+                for item in clip.walk():
+                    chain.append(item)
+            except NotImplementedError:
+                chain.append(NotImplementedError)
+            return chain
+
+        test_file = common.test_file_01()
+        with aaf2.open(test_file, 'r') as f:
+            clips = []
+            for mob in f.content.mobs:
+                for item, streams in mob.walk_references():
+                    if isinstance(item, aaf2.components.SourceClip):
+                        clips.append(item)
+
+            chains = [walk_chain(clip) for clip in clips]
+            assert [resolve_chain(clip) for clip in clips] == chains
+            assert any(chains)
+
+            # walking again only reads the cache
+            resolve = aaf2.components.SourceClip.resolve
+            def spy(self):
+                raise AssertionError("not cached")
+            aaf2.components.SourceClip.resolve = spy
+            try:
+                for clip, chain in zip(clips, chains):
+                    # errors are not cached
+                    if NotImplementedError not in chain:
+                        assert walk_chain(clip) == chain
+            finally:
+                aaf2.components.SourceClip.resolve = resolve
+
+        with aaf2.open() as f:
+            source = f.create.SourceMob("source")
+            source.descriptor = f.create.TapeDescriptor()
+            f.content.mobs.append(source)
+            source_slot = source.create_empty_slot(25, 'picture')
+            source_slot.segment.length = 100
+
+            master = f.create.MasterMob("master")
+            f.content.mobs.append(master)
+            master_slot = master.create_picture_slot()
+            master_clip = source.create_source_clip(source_slot.slot_id)
+            master_slot.segment.components.append(master_clip)
+
+            comp = f.create.CompositionMob("comp")
+            f.content.mobs.append(comp)
+            slot = comp.create_picture_slot()
+            clip = master.create_source_clip(master_slot.slot_id)
+            slot.segment.components.append(clip)
+            slot.segment.components.append(f.create.Filler('picture', 10))
+            chains = slot.segment.source_chains()
+            assert chains[0] == (clip, [master_clip, source_slot.segment])
+            assert chains[1][1] == []
+
+            # unrelated writes keep the cache
+            cache = f.content.source_cache()
+            assert cache
+            master.name = "renamed"
+            comp.usage = 'Usage_TopLevel'
+            clip.start = 0
+            assert f.content.source_cache() is cache
+
+            # edits clear the cache
+            master_slot.segment = f.create.Filler('picture', 100)
+            assert list(clip.walk()) == [master_slot.segment]
+            assert resolve_chain(clip) == [master_slot.segment]
 
 if __name__ == "__main__":
     unittest.main()
@@ -11,7 +11,10 @@ import uuid
 import unittest
 import common
 import shutil
+import struct
+import datetime
 from aaf2.auid import AUID
+from aaf2.metadict import default_model
 
 def has_duplicate_pid(f):
     pids = []
@@ -182,6 +185,132 @@ class ModelTests(unittest.TestCase):
         # print(new_typedef_count, original_typedef_count)
         # print(new_classdefs_count, original_classdefs_count)
 
+    def test_propertydef_lookup(self):
+        with aaf2.open() as f:
+            mob = f.create.MasterMob("lookup")
+            assert mob.get('Name').value == "lookup"
+            assert mob.getvalue('Name') == "lookup"
+            assert mob.getvalue('UsageCode', 'default') == 'default'
+            assert mob.get('UsageCode', allkeys=False) is None
+            assert mob.get('UsageCode') is not None
+            assert mob.get('NotAProperty') is None
+            assert 'Name' in mob
+
+            # registering on a parent class updates subclasses already looked up
+            mob_classdef = f.metadict.lookup_classdef('Mob')
+            p = mob_classdef.register_propertydef("LookupTest", AUID(int=43), 0xBEEE, 'aafInt64', True, False)
+            mob['LookupTest'].value = 42
+            assert mob.getvalue('LookupTest') == 42
+            assert mob.property_entries[0xBEEE] is mob.get('LookupTest')
+
+            # changing the pid updates the lookup
+            p.pid = 0xBEED
+            assert p.pid == 0xBEED
+            assert mob.get('LookupTest', allkeys=False) is None
+            assert mob.get('LookupTest').pid == 0xBEED
+
+            p['LocalIdentification'].value = 0xBEEC
+            assert p.pid == 0xBEEC
+            assert mob.get('LookupTest', allkeys=False) is None
+            assert mob.get('LookupTest').pid == 0xBEEC
+            assert mob_classdef.lookup_propertydefs('LookupTest') == ((0xBEEC, p),)
+
+    def test_default_model(self):
+        model = default_model()
+        test_file = common.test_file_01()
+        with aaf2.open(test_file, 'r') as f:
+            assert default_model() is model
+            metadict = f.metadict
+
+            # defs missing from the file are copied from the shared model on use
+            for name in ('Root', 'DescriptiveMarker', 'aafInt64'):
+                if name in model.classdefs_by_name:
+                    model_def = model.classdefs_by_name[name]
+                    d = metadict.lookup_classdef(name)
+                    assert metadict.lookup_classdef(d.auid) is d
+                    for p in d.all_propertydefs():
+                        assert p.root is f
+                        assert p.typedef is metadict.lookup_typedef(p.typedef_id)
+                else:
+                    model_def = model.typedefs_by_name[name]
+                    d = metadict.lookup_typedef(name)
+                    assert metadict.lookup_typedef(d.auid) is d
+
+                assert d is not model_def
+                assert d.root is f
+                assert model_def.root is not f
+                assert d.auid == model_def.auid
+
+            assert metadict.lookup_classdef('NotAClass') is None
+            common.walk_aaf(f.root)
+
+        # writeable files still get their own full model
+        with aaf2.open() as f:
+            for name, classdef in model.classdefs_by_name.items():
+                assert f.metadict.lookup_classdef(name).auid == classdef.auid
+
+    def test_record_struct(self):
+        with aaf2.open() as f:
+            rational = f.metadict.lookup_typedef('Rational')
+            assert rational.int_format == 'ii'
+            assert rational.compile()[0].size == 8
+            assert rational.encode('30000/1001') == struct.pack(str('<ii'), 30000, 1001)
+            assert rational.decode(struct.pack(str('<ii'), 24, 1)) == 24
+            # trailing data is ignored
+            assert rational.decode(struct.pack(str('<iii'), 24, 1, 0)) == 24
+
+            timestamp = f.metadict.lookup_typedef('TimeStamp')
+            assert timestamp.int_format == 'hBBBBBB'
+            d = datetime.datetime(2019, 12, 31, 23, 59, 58)
+            assert timestamp.encode(d) == struct.pack(str('<hBBBBBB'), 2019, 12, 31, 23, 59, 58, 0)
+            assert timestamp.decode(timestamp.encode(d)) == d
+
+            # integer backed enum members are packed by value
+            product_version = f.metadict.lookup_typedef('ProductVersion')
+            assert product_version.int_format == 'HHHHB'
+            v = {'major': 1, 'minor': 2, 'tertiary': 3, 'patchLevel': 4, 'type': 'VersionReleased'}
+            assert product_version.encode(v) == struct.pack(str('<HHHHB'), 1, 2, 3, 4, 1)
+            assert product_version.decode(product_version.encode(v)) == v
+            v['type'] = 1
+            assert product_version.decode(product_version.encode(v))['type'] == 'VersionReleased'
+
+            rgba = f.metadict.lookup_typedef('RGBAComponent')
+            assert rgba.int_format == 'BB'
+            v = {'Code': 'CompRed', 'Size': 8}
+            assert rgba.decode(rgba.encode(v)) == v
+
+            # records with non integer members fall back to per member decoding
+            eq_band = f.metadict.lookup_typedef('EqualizationBand')
+            assert eq_band.int_format is None
+            assert eq_band.compile()[0] is None
+
+    def test_array_types(self):
+        with aaf2.open() as f:
+            auid_array = f.metadict.lookup_typedef('aafAUIDArray')
+            values = [AUID(int=i) for i in range(1000)]
+            data = auid_array.encode(values)
+            assert data == b"".join([bytes(v.bytes_le) for v in values])
+            assert auid_array.decode(data) == values
+            view = auid_array.decode_array(data)
+            assert view[16:32].tobytes() == bytes(values[1].bytes_le)
+
+            auid_set = f.metadict.lookup_typedef('AUIDSet')
+            assert auid_set.decode(auid_set.encode(values)) == set(values)
+
+            int_array = f.metadict.lookup_typedef('aafInt32Array')
+            values = list(range(-500, 500))
+            data = int_array.encode(values)
+            a = int_array.decode_array(data)
+            assert list(a) == values
+            assert int_array.encode(a) == data
+
+            layout = f.metadict.lookup_typedef('aafRGBALayout')
+            values = [{'Code': 'CompRed', 'Size': 8}, {'Code': 'CompGreen', 'Size': 8}]
+            data = layout.encode(values)
+            assert len(data) == layout.byte_size
+            decoded = layout.decode(data)
+            assert decoded[:2] == values
+            assert decoded[2] == {'Code': 'CompNull', 'Size': 0}
 
 if __name__ == "__main__":
     import logging
@@ -342,9 +342,47 @@ class TestTransitions(unittest.TestCase):
             clip = seq.component_at_time(300)
             assert isinstance(clip, aaf2.components.Filler)
 
-
-
-
+    def test_position_index(self):
+        with aaf2.open() as f:
+            seq = f.create.Sequence('picture')
+            for i in range(30):
+                seq.components.append(f.create.Filler('picture', 10))
+                if i % 3 == 0:
+                    seq.components.append(f.create.Transition('picture', 4))
+
+            def check():
+                end = sum(c.length for c in seq.components) + 10
+                for t in range(end):
+                    assert seq.index_at_time(t) == seq.walk_index_at_time(t)
+
+            check()
+            index = seq.position_index()
+            assert seq.position_index() is index
+
+            # unrelated writes keep the index
+            mob = f.create.MasterMob("position index")
+            f.content.mobs.append(mob)
+            mob.name = "renamed"
+            seq.media_kind = 'picture'
+            assert seq.position_index() is index
+
+            # modifying components invalidates the index
+            seq.components[10].length = 25
+            assert seq.position_index() is not index
+            check()
+
+            index = seq.position_index()
+            seq.components.pop(5)
+            assert seq.position_index() is not index
+            index = seq.position_index()
+            seq.components.insert(20, f.create.Transition('picture', 2))
+            assert seq.position_index() is not index
+            check()
+
+            # transitions longer than the previous component fall back to walking
+            seq.components.insert(1, f.create.Transition('picture', 20))
+            assert seq.position_index() is None
+            check()
 
 if __name__ == "__main__":
     unittest.main()